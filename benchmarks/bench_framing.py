@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+'''Measures framing of large newline-delimited messages that arrive in small chunks.
+
+Feeds messages of increasing size through QWebChannelProtocol.data_received in
+TCP-segment sized chunks. With linear framing, the throughput stays constant
+as the message size grows.'''
+
+from pywebchannel.asynchronous import QWebChannelProtocol
+import argparse
+import asyncio
+import json
+import time
+
+
+class FramingProtocol(QWebChannelProtocol):
+
+    def message_received(self, data):
+        self.received += len(data)
+
+
+def make_message(size):
+    samples = [0.5] * (size // 4)
+    return (json.dumps({"type": 2, "data": samples}) + '\n').encode('utf-8')
+
+
+def bench(loop, size, chunkSize):
+    proto = FramingProtocol(loop=loop)
+    proto.received = 0
+    msg = make_message(size)
+
+    start = time.perf_counter()
+    for offset in range(0, len(msg), chunkSize):
+        proto.data_received(msg[offset:offset + chunkSize])
+    elapsed = time.perf_counter() - start
+
+    assert proto.received == len(msg) - 1
+    return len(msg), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk-size", type=int, default=1460)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="message sizes in MiB")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    print("{:>10} {:>10} {:>12}".format("size [MiB]", "time [s]", "MiB/s"))
+    for size in args.sizes:
+        nbytes, elapsed = bench(loop, size * 1024 * 1024, args.chunk_size)
+        mib = nbytes / (1024 * 1024)
+        print("{:>10.1f} {:>10.4f} {:>12.1f}".format(mib, elapsed, mib / elapsed))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
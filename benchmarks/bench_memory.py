@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+'''Measures the memory footprint of QObject proxies.
+
+Creates a channel with many identical objects and reports the memory allocated
+per proxy, after initialization, after accessing a signal of every proxy and
+after connecting a callback to a signal of every proxy.'''
+
+from pywebchannel.qwebchannel import QWebChannel, QWebChannelMessageTypes
+import argparse
+import gc
+import tracemalloc
+
+
+class NullTransport(object):
+
+    def send(self, data):
+        pass
+
+
+def descriptor():
+    return {
+        "methods": [["deleteLater", 2], ["setValue", 5], ["reset", 6]],
+        "properties": [
+            [0, "objectName", [1, 1], ""],
+            [1, "value", [1, 3], 0.5],
+            [2, "enabled", [1, 4], True],
+            [3, "unit", [1, 4], "V"],
+        ],
+        "signals": [["destroyed", 0], ["triggered", 7]],
+        "enums": {},
+    }
+
+
+def measure(count):
+    channel = QWebChannel()
+    channel.connection_made(NullTransport())
+    message = {"type": QWebChannelMessageTypes.response, "id": 0,
+               "data": dict(("object{}".format(i), descriptor()) for i in range(count))}
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    channel.message_received(message)
+    del message
+    gc.collect()
+    results = [("initialized", tracemalloc.get_traced_memory()[0] - base)]
+
+    for qObject in channel.objects.values():
+        qObject.triggered
+    gc.collect()
+    results.append(("signal accessed", tracemalloc.get_traced_memory()[0] - base))
+
+    callback = lambda *args: None
+    for qObject in channel.objects.values():
+        qObject.valueChanged.connect(callback)
+    gc.collect()
+    results.append(("signal connected", tracemalloc.get_traced_memory()[0] - base))
+
+    tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=20000, help="number of objects")
+    args = parser.parse_args()
+
+    print("{:<18} {:>12}".format("state", "bytes/proxy"))
+    for state, size in measure(args.count):
+        print("{:<18} {:>12.0f}".format(state, size / args.count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+'''Benchmarks for the protocol hot paths of pywebchannel.
+
+Runs against the in-process pywebchannel.server and in-memory transports, so no
+Qt application or network is needed. Run from the repository root:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --compare results.json
+
+Results are written as JSON. With --compare, each result is compared to a
+previous run and the exit status is 1 if any got slower by more than --threshold.'''
+
+from pywebchannel import asynchronous, server
+from pywebchannel.qwebchannel import QWebChannel, QWebChannelMessageTypes
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """Registers a benchmark. It returns a dict of result name -> (value, unit, lower is better)."""
+    BENCHMARKS.append(func)
+    return func
+
+
+def best_time(func, repeat=5, number=1):
+    """Returns the best time of repeat runs of number calls to func, per call."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return min(times)
+
+
+class NullTransport(object):
+
+    def send(self, data):
+        pass
+
+
+class Device(object):
+    '''Published object resembling one channel of an instrument.'''
+
+    valueChangedExtra = server.Signal()
+    value = server.Property(0.0)
+    enabled = server.Property(True)
+    unit = server.Property("V")
+
+    def __init__(self, peer=None):
+        self.peer = peer
+
+    def setValue(self, value):
+        self.value = value
+        return value
+
+    def echo(self, data):
+        return data
+
+
+def init_message(count):
+    srv = server.QWebChannelServer()
+    for i in range(count):
+        srv.registerObject("device{}".format(i), Device())
+    messages = []
+    session = srv.connect(messages.append)
+    srv.messageReceived(session, {"type": QWebChannelMessageTypes.init, "id": 0})
+    return messages[0]
+
+
+def initialized_channel(count, channelType=QWebChannel):
+    channel = channelType()
+    channel.connection_made(NullTransport())
+    channel.message_received(init_message(count))
+    return channel
+
+
+@benchmark
+def init(results):
+    for count in (100, 1000, 10000):
+        channel = QWebChannel()
+        data = channel.codec.encode(init_message(count))
+
+        def run():
+            channel = QWebChannel()
+            channel.connection_made(NullTransport())
+            channel.message_received(data)
+
+        results["init.{}_objects".format(count)] = (best_time(run, repeat=3), "s", True)
+
+
+@benchmark
+def method_calls(results):
+    async def main():
+        srv = server.QWebChannelServer(loop=asyncio.get_running_loop())
+        srv.registerObject("device", Device())
+        channel = asynchronous.QWebChannel()
+        srv.connectChannel(channel)
+        await channel
+        device = channel.objects["device"]
+
+        latencies = []
+        for i in range(2000):
+            start = time.perf_counter()
+            await device.setValue(i)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        results["call.latency_median"] = (statistics.median(latencies), "s", True)
+        results["call.latency_p99"] = (latencies[int(len(latencies) * 0.99)], "s", True)
+
+        count = 10000
+        start = time.perf_counter()
+        await asyncio.gather(*(device.echo(i) for i in range(count)))
+        results["call.throughput"] = (count / (time.perf_counter() - start), "calls/s", False)
+
+    asyncio.run(main())
+
+
+@benchmark
+def property_updates(results):
+    objects, listeners = 1000, 4
+    channel = initialized_channel(objects)
+    for name in list(channel.objects):
+        for _ in range(listeners):
+            channel.objects[name].valueChanged.connect(lambda value: None)
+
+    data = []
+    for i in range(objects):
+        data.append({"object": "device{}".format(i), "signals": {"1": [1.5]},
+                     "properties": {"2": 1.5}})
+    message = channel.codec.encode({"type": QWebChannelMessageTypes.propertyUpdate, "data": data})
+
+    elapsed = best_time(lambda: channel.message_received(message))
+    results["propertyUpdate.fanout"] = (objects * listeners / elapsed, "callbacks/s", False)
+
+
+@benchmark
+def signal_stream(results):
+    objects = 100
+    channel = initialized_channel(objects)
+    for name in list(channel.objects):
+        channel.objects[name].valueChangedExtra.connect(lambda value: None)
+        channel.objects[name].valueChanged.connect(lambda value: None)
+
+    encode = channel.codec.encode
+    messages = [encode({"type": QWebChannelMessageTypes.signal, "object": "device{}".format(i % objects),
+                        "signal": 4, "args": [i * 0.5]}) for i in range(10000)]
+    messages += [encode({"type": QWebChannelMessageTypes.propertyUpdate,
+                         "data": [{"object": "device{}".format(i % objects), "signals": {"3": [i * 0.5]},
+                                   "properties": {"2": i * 0.5}}]}) for i in range(10000)]
+
+    def run():
+        for message in messages:
+            channel.message_received(message)
+
+    results["signal.stream"] = (len(messages) / best_time(run), "messages/s", False)
+
+
+@benchmark
+def unwrap(results):
+    channel = initialized_channel(10)
+    qObject = channel.objects["device0"]
+
+    def nested(depth):
+        if depth == 0:
+            return [{"id": i, "value": i * 0.5, "ref": {"__QObject*__": True, "id": "device1"}}
+                    for i in range(10)]
+        return {"level": depth, "children": [nested(depth - 1) for _ in range(3)]}
+
+    payload = nested(6)
+    results["unwrap.nested"] = (best_time(lambda: qObject._unwrapQObject(payload)), "s", True)
+
+    samples = [i * 0.5 for i in range(1000000)]
+    results["unwrap.plain_array"] = (best_time(lambda: qObject._unwrapQObject(samples)), "s", True)
+
+    # a method response with a large array, including decoding
+    rows = [[i * 0.5, i * 0.25, i] for i in range(100000)]
+    message = channel.codec.encode({"type": QWebChannelMessageTypes.response, "id": 0, "data": rows})
+
+    def run():
+        channel.execId = 0
+        qObject.echo(None, lambda result: None)
+        channel.message_received(message)
+
+    results["unwrap.response_plain_rows"] = (best_time(run), "s", True)
+
+
+@benchmark
+def framing(results):
+    class FramingProtocol(asynchronous.QWebChannelProtocol):
+
+        def message_received(self, data):
+            pass
+
+    loop = asyncio.new_event_loop()
+    message = (json.dumps({"type": 2, "data": [0.5] * (2 * 1024 * 1024)}) + '\n').encode('utf-8')
+    chunks = [message[i:i + 1460] for i in range(0, len(message), 1460)]
+
+    def run():
+        proto = FramingProtocol(loop=loop)
+        for chunk in chunks:
+            proto.data_received(chunk)
+
+    elapsed = best_time(run, repeat=3)
+    results["framing.large_message"] = (len(message) / elapsed / 1024 / 1024, "MiB/s", False)
+    loop.close()
+
+
+def compare(results, baseline, threshold):
+    """Prints the change of each result relative to baseline. Returns whether any regressed."""
+    regressed = False
+    print("{:<28} {:>14} {:>14} {:>9}".format("benchmark", "baseline", "current", "change"))
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], result["value"]
+        change = (new - old) / old
+        worse = change > threshold if result["lower_is_better"] else change < -threshold
+        regressed = regressed or worse
+        print("{:<28} {:>14.6g} {:>14.6g} {:>+8.1%}{}".format(
+            name, old, new, change, "  REGRESSION" if worse else ""))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change counted as regression (default: 0.1)")
+    parser.add_argument("--only", nargs="+", help="only run these benchmarks")
+    args = parser.parse_args()
+
+    results = {}
+    for func in BENCHMARKS:
+        if args.only and func.__name__ not in args.only:
+            continue
+        raw = {}
+        func(raw)
+        for name, (value, unit, lowerIsBetter) in raw.items():
+            results[name] = {"value": value, "unit": unit, "lower_is_better": lowerIsBetter}
+            print("{:<28} {:>14.6g} {}".format(name, value, unit))
+
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print()
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,44 +1,15 @@
 from pywebchannel.asynchronous import QWebChannel
+from pywebchannel.transports import WebSocketTransport
 import websockets
 import websockets.client
 import asyncio
 from aioconsole import ainput
-import json
 import sys
 
 
 CHATSERVER_URL = 'ws://localhost:12345'
 
 
-class QWebChannelWebSocketProtocol(websockets.client.WebSocketClientProtocol):
-    """ Bridges WebSocketClientProtocol and QWebChannel.
-
-    Continuously reads messages in a task and invokes QWebChannel.message_received()
-    for each. Calls QWebChannel.connection_open() when connected.
-    Also patches QWebChannel.send() to run the websocket's send() in a task"""
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def _task_send(self, data):
-        if not isinstance(data, str):
-            data = json.dumps(data)
-        self.loop.create_task(self.send(data))
-
-    def connection_open(self):
-        super().connection_open()
-
-        self.webchannel = QWebChannel()
-        self.webchannel.send = self._task_send
-        self.webchannel.connection_made(self)
-
-        self.loop.create_task(self.read_msgs())
-
-    async def read_msgs(self):
-        async for msg in self:
-            self.webchannel.message_received(msg)
-
-
 def print_newmessage(time, user, message):
     print("[{}] {}: {}".format(time, user, message))
 
@@ -83,10 +54,15 @@ async def run(webchannel):
         msg = await ainput()
         chatserver.sendMessage(username, msg)
 
-try:
-    loop = asyncio.get_event_loop()
+async def main():
     print("Connecting...")
-    proto = loop.run_until_complete(websockets.client.connect(CHATSERVER_URL, create_protocol=QWebChannelWebSocketProtocol))
-    loop.run_until_complete(run(proto.webchannel))
+    async with websockets.client.connect(CHATSERVER_URL) as websocket:
+        webchannel = QWebChannel()
+        transport = WebSocketTransport(webchannel, websocket)
+        asyncio.ensure_future(transport.run())
+        await run(webchannel)
+
+try:
+    asyncio.get_event_loop().run_until_complete(main())
 except KeyboardInterrupt:
     print("Quit.")
@@ -1,31 +1,67 @@
 # -*- coding: utf-8 -*-
 
-from .qwebchannel import (QObject as PlainQObject,
+from .qwebchannel import (Batch as PlainBatch,
+                          ConnectionClosedError,
+                          QObject as PlainQObject,
                           QWebChannel as PlainQWebChannel)
+from .framing import LineFramer, LengthPrefixFramer, FrameTooLargeError
+from .streaming import StreamingFramer
 import asyncio
-import inspect
-import json
+
+
+def _setFutureResult(fut, result):
+    if not fut.done():
+        fut.set_result(result)
+
+
+def _setFutureException(fut, error):
+    if not fut.done():
+        fut.set_exception(error)
+
+
+class Batch(PlainBatch):
+    '''Batch usable with async with. Awaiting it gathers the results of all
+    method calls made within it, in order.'''
+
+    def __init__(self, webChannel):
+        super().__init__(webChannel)
+        self.futures = []
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        self.__exit__(*exc_info)
+
+    def __await__(self):
+        return asyncio.gather(*self.futures).__await__()
 
 
 class QObject(PlainQObject):
 
-    def _addMethod(self, methodData):
-        super()._addMethod(methodData)
+    __slots__ = ()
+
+    def _invokeMethod(self, methodIdx, arguments, timeout=None):
+        webChannel = self._webChannel
+        fut = webChannel._loop.create_future()
 
-        methodName = methodData[0];
-        method = getattr(self, methodName)
+        def handleResponse(*args):
+            webChannel._loop.call_soon_threadsafe(_setFutureResult, fut, *args)
 
-        def amethod(*args):
-            fut = self._webChannel._loop.create_future()
+        def handleError(error):
+            webChannel._loop.call_soon_threadsafe(_setFutureException, fut, error)
 
-            def handleResponse(*args):
-                self._webChannel._loop.call_soon_threadsafe(fut.set_result, *args)
+        execId = super()._invokeMethod(methodIdx, arguments + (handleResponse,),
+                                       errback=handleError, timeout=timeout)
 
-            method(*args, handleResponse)
-            return fut
+        def handleDone(fut):
+            if fut.cancelled():
+                webChannel.cancelExec(execId)
 
-        setattr(amethod, 'isQtMethod', True)
-        setattr(self, methodName, amethod)
+        fut.add_done_callback(handleDone)
+        if webChannel._batch is not None:
+            webChannel._batch.futures.append(fut)
+        return fut
 
 
 class QWebChannel(PlainQWebChannel):
@@ -40,41 +76,244 @@ class QWebChannel(PlainQWebChannel):
         self._loop = loop
 
         self.__initialized_future = self._loop.create_future()
+        self._capacityWaiters = []
+
+    def _callLater(self, delay, callback, *args):
+        return self._loop.call_later(delay, callback, *args)
+
+    def _canSend(self):
+        """Returns whether further messages are sent right away."""
+        return self._hasCapacity()
+
+    def _wakeCapacityWaiters(self):
+        if self._capacityWaiters and self._canSend():
+            for waiter in self._capacityWaiters:
+                _setFutureResult(waiter, None)
+            self._capacityWaiters.clear()
+
+    def _popCall(self, execId):
+        call = super()._popCall(execId)
+        self._wakeCapacityWaiters()
+        return call
+
+    def _failPendingCalls(self, errorType, reason):
+        super()._failPendingCalls(errorType, reason)
+        self._wakeCapacityWaiters()
+
+    async def drain(self):
+        """Waits until calls are sent right away again, i.e. fewer than maxPendingCalls are pending."""
+        while not self._canSend():
+            waiter = self._loop.create_future()
+            self._capacityWaiters.append(waiter)
+            await waiter
+
+    def batch(self):
+        """Returns a Batch, to be used with async with.
+
+        All messages sent within it are written at once when leaving it.
+        Awaiting the batch afterwards returns the results of the method calls made within it."""
+        return Batch(self)
 
     def __await__(self):
         return self.__initialized_future.__await__()
 
     def initialized(self):
         super().initialized()
-        self._loop.call_soon_threadsafe(self.__initialized_future.set_result, None)
+        # the future is already done if the channel was initialized before a reconnect
+        self._loop.call_soon_threadsafe(_setFutureResult, self.__initialized_future, None)
 
 
-class QWebChannelProtocol(QWebChannel):
+class QWebChannelProtocol(QWebChannel, asyncio.Protocol):
     '''A QWebChannel subclass implementing the asyncio.Protocol interface.
 
-    For use with streaming transports. Assumes newline-delimited messages.'''
+    For use with streaming transports. Assumes newline-delimited messages, or
+    length-prefixed messages if the codec is binary.
+    If maxFrameSize is given, the connection is closed when a message exceeds it.
+
+    Outgoing messages are buffered and written at once in the next iteration of
+    the event loop. While the transport's write buffer is above its high-water
+    mark, drain() waits until it falls below the low-water mark again. The marks
+    default to those of the transport, or are set with writeHighWater and
+    writeLowWater (in bytes).
 
-    def __init__(self, *args, **kwargs):
+    With streaming=True, large messages are decoded while they are received,
+    see pywebchannel.streaming.'''
+
+    def __init__(self, *args, maxFrameSize=None, writeHighWater=None, writeLowWater=None,
+                 streaming=False, **kwargs):
         super().__init__(*args, **kwargs)
-        self._buf = b''
+        if streaming:
+            if self.codec.binary:
+                raise ValueError("Streaming decoding requires a text codec")
+            self._framer = StreamingFramer(self, maxFrameSize)
+        else:
+            framerType = LengthPrefixFramer if self.codec.binary else LineFramer
+            self._framer = framerType(maxFrameSize)
+        self.transport = None
+
+        self.writeHighWater = writeHighWater
+        self.writeLowWater = writeLowWater
+        # Frames to be written in the next loop iteration
+        self._outgoing = []
+        self._flushScheduled = False
+        self._writePaused = False
+
+    def connection_made(self, transport):
+        self._framer.reset()
+        self._outgoing = []
+        self._writePaused = False
+        if self.writeHighWater is not None or self.writeLowWater is not None:
+            transport.set_write_buffer_limits(self.writeHighWater, self.writeLowWater)
+        super().connection_made(transport)
 
-    def _try_process_messages(self):
-        msgs = self._buf.split(b'\n')
+    def connection_lost(self, exc):
+        if self._outgoing:
+            print("Connection lost, discarding {} unsent frames".format(len(self._outgoing) // 2))
+        self._outgoing = []
+        self._writePaused = False
+        self.connection_closed()
+        self._wakeCapacityWaiters()
 
-        # This is either empty (if last char is '\n') or contains an incomplete message, so we're good.
-        self._buf = msgs[-1]
+    def pause_writing(self):
+        self._writePaused = True
 
-        # Strip of incomplete or empty message
-        msgs = msgs[:-1]
+    def resume_writing(self):
+        self._writePaused = False
+        self._wakeCapacityWaiters()
 
-        for msg in msgs:
-            self.message_received(msg.decode('utf-8'))
+    def _canSend(self):
+        return not self._writePaused and super()._canSend()
+
+    async def drain(self):
+        """Writes buffered messages and waits until further messages are sent right away.
+
+        That is, until the transport is below its low-water mark and fewer than
+        maxPendingCalls calls are pending."""
+        self.flush()
+        await super().drain()
+
+    def _frame_received(self, frame):
+        self.message_received(frame)
 
     def data_received(self, data):
-        self._buf += data
-        self._try_process_messages()
+        try:
+            self._framer.feed(data, self._frame_received)
+        except FrameTooLargeError as e:
+            print("Closing connection: " + str(e))
+            self.transport.close()
+
+    def _encode(self, data):
+        if isinstance(data, str):
+            return data.encode('utf-8')
+        return self.codec.encode(data)
+
+    def _frame(self, data):
+        payload = self._encode(data)
+        if self.stats is not None:
+            self.stats.messageSent(data, len(payload))
+        if self.recorder is not None:
+            self.recorder.sent(payload)
+        return self._framer.pack(payload)
+
+    def _scheduleFlush(self):
+        if not self._flushScheduled:
+            self._flushScheduled = True
+            self._loop.call_soon(self._scheduledFlush)
+
+    def _scheduledFlush(self):
+        self._flushScheduled = False
+        self.flush()
+
+    def flush(self):
+        """Writes all buffered messages now."""
+        if not self._outgoing:
+            return
+        buffers, self._outgoing = self._outgoing, []
+        if self.transport is not None:
+            self.transport.writelines(buffers)
+
+    def close(self):
+        """Writes all buffered messages and closes the transport.
+
+        Use this instead of closing the transport directly, which would discard
+        the messages sent in the current iteration of the event loop."""
+        if self.transport is not None:
+            self.flush()
+            self.transport.close()
+
+    def send(self, data):
+        self._outgoing.extend(self._frame(data))
+        self._scheduleFlush()
+
+    def sendBatch(self, messages):
+        for data in messages:
+            self._outgoing.extend(self._frame(data))
+        self._scheduleFlush()
+
+
+class ReconnectingQWebChannel(QWebChannelProtocol):
+    '''A QWebChannelProtocol which connects again whenever the connection is lost.
+
+    connect is called with a protocol factory and returns an awaitable making the
+    connection, e.g. lambda factory: loop.create_connection(factory, host, port).
+    Failed attempts are retried with exponential backoff, from retryInterval up
+    to maxRetryInterval seconds.
+
+    Existing QObjects, their properties and signal connections stay valid across
+    reconnects. Pending calls are replayed by default, see pendingCallPolicy of
+    QWebChannel. Messages without response, e.g. property writes, are dropped
+    while disconnected. initCallback is invoked after every initialization.'''
+
+    def __init__(self, connect, *args, retryInterval=0.1, maxRetryInterval=10.0,
+                 pendingCallPolicy="replay", **kwargs):
+        super().__init__(*args, pendingCallPolicy=pendingCallPolicy, **kwargs)
+        self._connect = connect
+        self.retryInterval = retryInterval
+        self.maxRetryInterval = maxRetryInterval
+        self._closing = False
+        self._reconnectTask = None
+
+    async def start(self):
+        """Connects and waits until the channel is initialized."""
+        await self._connectWithRetry()
+        await self
+
+    async def _connectWithRetry(self):
+        delay = self.retryInterval
+        while not self._closing:
+            try:
+                await self._connect(lambda: self)
+                return
+            except OSError as e:
+                print("Connecting QWebChannel failed, retrying in {:g} s: {}".format(delay, e))
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, self.maxRetryInterval)
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        self.transport = None
+        if not self._closing:
+            self._reconnectTask = self._loop.create_task(self._connectWithRetry())
+
+    @property
+    def connected(self):
+        return self.transport is not None
 
     def send(self, data):
-        if not isinstance(data, str):
-            data = json.dumps(data)
-        self.transport.write((data + '\n').encode('utf-8'))
+        if self.transport is not None:
+            super().send(data)
+
+    def sendBatch(self, messages):
+        if self.transport is not None:
+            super().sendBatch(messages)
+
+    def close(self):
+        """Closes the connection without reconnecting. Pending calls fail."""
+        self._closing = True
+        self.pendingCallPolicy = "fail"
+        if self._reconnectTask is not None:
+            self._reconnectTask.cancel()
+        if self.transport is not None:
+            super().close()
+        else:
+            self._failPendingCalls(ConnectionClosedError, "Connection closed")
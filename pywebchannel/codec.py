@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+'''Message codecs for QWebChannel.
+
+A codec turns message dicts into bytes and back. JSON codecs can be used with
+any QWebChannel peer; the binary codecs are only understood by other Python
+peers (e.g. pywebchannel.server) and require length-prefixed framing.'''
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class JsonCodec(object):
+    '''JSON codec based on the json module of the standard library.'''
+
+    binary = False
+
+    def encode(self, data):
+        """Returns data encoded as bytes."""
+        return json.dumps(data).encode('utf-8')
+
+    def encodeText(self, data):
+        """Returns data encoded as str, for text-based transports."""
+        return json.dumps(data)
+
+    def decode(self, data):
+        """Decodes a message from str or a bytes-like object."""
+        if isinstance(data, memoryview):
+            data = str(data, 'utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    '''JSON codec based on orjson.
+
+    Falls back to the standard library for data orjson refuses to serialize,
+    like dicts with non-string keys or integers exceeding 64 bits.'''
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires the orjson package")
+
+    def encode(self, data):
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            return super().encode(data)
+
+    def encodeText(self, data):
+        return self.encode(data).decode('utf-8')
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    '''JSON codec based on ujson.'''
+
+    def __init__(self):
+        if ujson is None:
+            raise ImportError("UjsonCodec requires the ujson package")
+
+    def encode(self, data):
+        return ujson.dumps(data).encode('utf-8')
+
+    def encodeText(self, data):
+        return ujson.dumps(data)
+
+    def decode(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return ujson.loads(data)
+
+
+class MsgpackCodec(object):
+    '''Binary codec based on MessagePack, for Python-to-Python deployments.'''
+
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("MsgpackCodec requires the msgpack package")
+
+    def encode(self, data):
+        return msgpack.packb(data)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class CborCodec(object):
+    '''Binary codec based on CBOR, for Python-to-Python deployments.'''
+
+    binary = True
+
+    def __init__(self):
+        if cbor2 is None:
+            raise ImportError("CborCodec requires the cbor2 package")
+
+    def encode(self, data):
+        return cbor2.dumps(data)
+
+    def decode(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return cbor2.loads(data)
+
+
+def defaultCodec():
+    """Returns the fastest JSON codec available."""
+    if orjson is not None:
+        return OrjsonCodec()
+    if ujson is not None:
+        return UjsonCodec()
+    return JsonCodec()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+'''Generates a Python module with proxy classes from a captured init message.
+
+Normally, the class of each QObject is built at runtime from the init message.
+A generated module contains these classes as source code instead, which saves
+building them and allows IDE completion:
+
+    python -m pywebchannel.codegen init.json -o chatproxies.py
+
+where init.json holds the response to the init message, or just its data. Use
+the module with
+
+    channel.useGeneratedProxies(chatproxies)
+
+The classes derive from pywebchannel.qwebchannel.QObject, or the class given with
+--base, e.g. pywebchannel.asynchronous.QObject. They also work with channels
+using another QObject class, but then have to be combined with it at runtime.
+
+Each class records a hash of the schema it was generated from. Objects whose
+schema differs, e.g. after the server was updated, get a dynamic class as usual.'''
+
+from .qwebchannel import _schemaHash, _schemaKey
+import argparse
+import json
+import keyword
+import re
+import sys
+
+
+_HEADER = '''# -*- coding: utf-8 -*-
+"""QWebChannel proxy classes generated by pywebchannel.codegen. Do not edit.
+
+Use them with QWebChannel.useGeneratedProxies()."""
+
+from pywebchannel.qwebchannel import SignalDescriptor, _Unresolved
+from {module} import {name} as _Base
+import enum
+
+
+def _qtMethod(func):
+    func.isQtMethod = True
+    return func
+
+
+def _method(methodIdx):
+    def method(self, *arguments, **options):
+        return self._invokeMethod(methodIdx, arguments, **options)
+    return _qtMethod(method)
+
+
+def _property(propertyIndex, propertyName):
+    def getter(self):
+        value = self._propertyCache[propertyIndex]
+        if type(value) is _Unresolved:
+            value = self._resolveProperty(propertyIndex)
+        return value
+
+    def setter(self, value):
+        self._setProperty(propertyIndex, propertyName, value)
+
+    return property(getter, setter, doc="Property")
+'''
+
+
+def _isIdentifier(name):
+    return name.isidentifier() and not keyword.iskeyword(name)
+
+
+def _className(objectName, used):
+    parts = re.split(r'[^0-9a-zA-Z]+', objectName)
+    name = ''.join(part[:1].upper() + part[1:] for part in parts) or 'Object'
+    if name[0].isdigit():
+        name = 'Object' + name
+    name += 'Proxy'
+    candidate, i = name, 2
+    while candidate in used:
+        candidate = name + str(i)
+        i += 1
+    used.add(candidate)
+    return candidate
+
+
+def _members(data):
+    """Returns the members of a proxy class in order of definition, as name -> (kind, info).
+
+    Later definitions replace earlier ones of the same name, like in QObject._setSchema()."""
+    members = {}
+    methodNames = {}
+    signalNames = {}
+    propertyNames = {}
+    notifySignals = set()
+    propertyNotifySignals = {}
+
+    for methodName, methodIdx in data["methods"]:
+        members.pop(methodName, None)
+        members[methodName] = ("method", methodIdx)
+        if '(' not in methodName or methodIdx not in methodNames:
+            methodNames[methodIdx] = methodName
+
+    for propertyIndex, propertyName, notifySignalData, value in data["properties"]:
+        propertyIndex = int(propertyIndex)
+        if notifySignalData:
+            signalName, signalIndex = notifySignalData
+            if signalName == 1:
+                signalName = propertyName + "Changed"
+            members.pop(signalName, None)
+            members[signalName] = ("signal", (signalIndex, propertyName))
+            signalNames[signalIndex] = signalName
+            notifySignals.add(signalIndex)
+            propertyNotifySignals[propertyIndex] = signalIndex
+        members.pop(propertyName, None)
+        members[propertyName] = ("property", propertyIndex)
+        propertyNames[propertyIndex] = propertyName
+
+    for signalName, signalIndex in data["signals"]:
+        members.pop(signalName, None)
+        members[signalName] = ("signal", (signalIndex, None))
+        signalNames[signalIndex] = signalName
+
+    for enumName, values in data.get("enums", {}).items():
+        members.pop(enumName, None)
+        members[enumName] = ("enum", values)
+
+    attributes = {
+        "_methodNames": methodNames,
+        "_signalNames": signalNames,
+        "_propertyNames": propertyNames,
+        "_signalKeys": dict(kv for i in signalNames for kv in ((i, i), (str(i), i))),
+        "_propertyKeys": dict(kv for prop in data["properties"]
+                              for kv in ((int(prop[0]), int(prop[0])), (str(prop[0]), int(prop[0])),
+                                         (prop[1], int(prop[0])))),
+        "_notifySignals": notifySignals,
+        "_propertyNotifySignals": propertyNotifySignals,
+    }
+    return members, attributes
+
+
+def _generateClass(objectName, data, className):
+    # the hash has to be computed from the unmodified descriptor
+    schemaHash = _schemaHash(_schemaKey(data))
+    members, attributes = _members(data)
+
+    lines = ["", "", "class {}(_Base):".format(className),
+             "    {!r}".format("Interface for remote object {0}".format(objectName)),
+             "",
+             "    __slots__ = ()",
+             "",
+             "    SCHEMA_HASH = {!r}".format(schemaHash),
+             ""]
+    for name, value in attributes.items():
+        if isinstance(value, set):
+            value = "set({!r})".format(sorted(value)) if value else "set()"
+        else:
+            value = repr(value)
+        lines.append("    {} = {}".format(name, value))
+
+    deferred = []
+    for name, (kind, info) in members.items():
+        if not _isIdentifier(name):
+            if kind == "method":
+                value = "_method({!r})".format(info)
+            elif kind == "property":
+                value = "_property({!r}, {!r})".format(info, name)
+            elif kind == "signal":
+                value = "SignalDescriptor({!r}, {!r}, {!r})".format(info[0], name, info[1])
+            else:
+                value = "enum.IntEnum({!r}, {!r})".format(name, info)
+            deferred.append("setattr({}, {!r}, {})".format(className, name, value))
+            continue
+
+        lines.append("")
+        if kind == "method":
+            lines += ["    @_qtMethod",
+                      "    def {}(self, *arguments, **options):".format(name),
+                      "        return self._invokeMethod({!r}, arguments, **options)".format(info)]
+        elif kind == "property":
+            lines += ["    @property",
+                      "    def {}(self):".format(name),
+                      '        """Property"""',
+                      "        value = self._propertyCache[{!r}]".format(info),
+                      "        if type(value) is _Unresolved:",
+                      "            value = self._resolveProperty({!r})".format(info),
+                      "        return value",
+                      "",
+                      "    @{}.setter".format(name),
+                      "    def {}(self, value):".format(name),
+                      "        self._setProperty({!r}, {!r}, value)".format(info, name)]
+        elif kind == "signal":
+            lines.append("    {} = SignalDescriptor({!r}, {!r}, {!r})".format(
+                name, info[0], name, info[1]))
+        else:
+            lines.append("    {} = enum.IntEnum({!r}, {!r})".format(name, name, info))
+
+    if deferred:
+        lines.append("")
+        lines.append("")
+        lines += deferred
+    return lines
+
+
+def generateModule(initData, baseClass="pywebchannel.qwebchannel.QObject"):
+    """Returns the source of a module with proxy classes for the objects in initData.
+
+    initData is the response to the init message, or its data. The classes
+    derive from baseClass, given by its qualified name."""
+    if "type" in initData and "data" in initData:
+        initData = initData["data"]
+
+    module, _, name = baseClass.rpartition(".")
+    lines = [_HEADER.format(module=module, name=name).rstrip("\n")]
+    used = set()
+    classNames = {}
+    for objectName, data in initData.items():
+        classNames[objectName] = _className(objectName, used)
+        lines += _generateClass(objectName, data, classNames[objectName])
+
+    lines += ["", "", "# object name -> proxy class", "PROXIES = {"]
+    lines += ["    {!r}: {},".format(objectName, className)
+              for objectName, className in classNames.items()]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSON file with the init response, - for stdin")
+    parser.add_argument("-o", "--output", help="output module, default stdout")
+    parser.add_argument("--base", default="pywebchannel.qwebchannel.QObject",
+                        help="qualified name of the base class (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.input == "-":
+        initData = json.load(sys.stdin)
+    else:
+        with open(args.input) as f:
+            initData = json.load(f)
+
+    source = generateModule(initData, args.base)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(source)
+    else:
+        sys.stdout.write(source)
+
+
+if __name__ == '__main__':
+    main()
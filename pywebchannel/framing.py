@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+
+class FrameTooLargeError(ValueError):
+    """Raised when a frame exceeds the maximum frame size of a framer."""
+
+
+class Framer(object):
+    '''Base class for splitting a byte stream into frames.
+
+    Incoming data is appended to a bytearray and complete frames are handed out
+    as memoryview slices of the buffer; they are only valid during the callback.'''
+
+    def __init__(self, maxFrameSize=None):
+        self.maxFrameSize = maxFrameSize
+        self._buf = bytearray()
+
+    def __len__(self):
+        return len(self._buf)
+
+    def _checkSize(self, size):
+        if self.maxFrameSize is not None and size > self.maxFrameSize:
+            self.reset()
+            raise FrameTooLargeError("Frame of {} bytes exceeds maximum size of {} bytes"
+                                     .format(size, self.maxFrameSize))
+
+    def reset(self):
+        """Discards all buffered data."""
+        self._buf = bytearray()
+
+    def detach(self):
+        """Returns the buffered data and clears the buffer."""
+        buf = self._buf
+        self.reset()
+        return buf
+
+    def feed(self, data, frameCallback):
+        """Appends data to the buffer and invokes frameCallback for each complete frame."""
+        raise NotImplementedError
+
+    def pack(self, payload):
+        """Returns a sequence of buffers making up the frame for payload, for use with writelines()."""
+        raise NotImplementedError
+
+
+class LineFramer(Framer):
+    '''Splits a byte stream into newline-delimited frames.
+
+    Only the newly arrived bytes are scanned for the delimiter, so the cost of
+    framing is linear in the size of the stream no matter how small the chunks are.'''
+
+    delimiter = b'\n'
+
+    def __init__(self, maxFrameSize=None):
+        super().__init__(maxFrameSize)
+        # Number of bytes at the start of _buf known not to contain a delimiter
+        self._scanned = 0
+
+    def reset(self):
+        super().reset()
+        self._scanned = 0
+
+    def feed(self, data, frameCallback):
+        buf = self._buf
+        buf += data
+
+        pos = buf.find(self.delimiter, self._scanned)
+        start = 0
+        try:
+            if pos >= 0:
+                with memoryview(buf) as view:
+                    while pos >= 0:
+                        frameStart, start = start, pos + 1
+                        self._checkSize(pos - frameStart)
+                        with view[frameStart:pos] as frame:
+                            frameCallback(frame)
+                        pos = buf.find(self.delimiter, start)
+        finally:
+            # buf is no longer ours if the framer was reset due to an oversized frame
+            if buf is self._buf:
+                # Deleting from the front of a bytearray does not move the remaining data
+                del buf[:start]
+                self._scanned = len(buf)
+
+        self._checkSize(len(buf))
+
+    def pack(self, payload):
+        return (payload, self.delimiter)
+
+
+class LengthPrefixFramer(Framer):
+    '''Splits a byte stream into frames prefixed with their size as unsigned 32 bit big-endian integer.
+
+    Suitable for binary payloads, which may contain any byte.'''
+
+    header = struct.Struct('>I')
+
+    def feed(self, data, frameCallback):
+        buf = self._buf
+        buf += data
+
+        headerSize = self.header.size
+        start = 0
+        try:
+            with memoryview(buf) as view:
+                while len(buf) - start >= headerSize:
+                    size, = self.header.unpack_from(buf, start)
+                    self._checkSize(size)
+                    end = start + headerSize + size
+                    if end > len(buf):
+                        break
+                    frameStart, start = start + headerSize, end
+                    with view[frameStart:end] as frame:
+                        frameCallback(frame)
+        finally:
+            # buf is no longer ours if the framer was reset due to an oversized frame
+            if buf is self._buf:
+                del buf[:start]
+
+    def pack(self, payload):
+        return (self.header.pack(len(payload)), payload)
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+'''Sharing of one QWebChannel connection between many clients.
+
+A ChannelHub serves clients like a QWebChannelServer, but on behalf of an
+upstream QWebChannel connected to the actual server, e.g. a Qt application:
+
+    upstream = QWebChannelProtocol()
+    await loop.create_connection(lambda: upstream, host, port)
+    await upstream
+
+    hub = ChannelHub(upstream)
+    await hub.serveUnix("/run/app/webchannel")  # for other processes
+    view = QWebChannel()
+    hub.connectChannel(view)                    # in this process
+
+Clients are answered from the objects and property cache of the upstream
+channel, so their init message does not reach the server. Method calls and
+property writes are forwarded. Signal connections are counted, so the server is
+asked only once to send a signal, no matter how many clients connected to it.
+Signals and property updates received upstream are passed on to the clients;
+property updates are merged for clients that have not yet processed the previous
+one, like QWebChannelServer does.'''
+
+from .qwebchannel import QObject, QWebChannelMessageTypes, Signal, _QOBJECT_MARKER, _Unresolved
+from .server import _BaseServer
+
+
+class _Unwrapper(object):
+    '''Unwraps values received by the upstream channel, as its QObjects do.'''
+
+    _unwrapQObject = QObject._unwrapQObject
+
+    def __init__(self, webChannel):
+        self._webChannel = webChannel
+
+
+def _keepConnected(*args):
+    """Callback holding the upstream connection of a signal with clients."""
+
+
+class ChannelHub(_BaseServer):
+    '''Serves clients through a single upstream QWebChannel, see the module documentation.
+
+    The hub uses the event loop of the upstream channel, if it has one.'''
+
+    def __init__(self, upstream, loop=None):
+        super().__init__(loop if loop is not None else getattr(upstream, '_loop', None))
+        self.upstream = upstream
+        self._unwrapper = _Unwrapper(upstream)
+        # (object id, signal index) -> number of clients connected to the signal
+        self._signalRefs = {}
+        # (session, message) of init messages received before upstream was initialized
+        self._pendingInits = []
+
+        self._handlers = {
+            QWebChannelMessageTypes.init: self._handleInit,
+            QWebChannelMessageTypes.idle: self._handleIdle,
+            QWebChannelMessageTypes.debug: self._handleDebug,
+            QWebChannelMessageTypes.invokeMethod: self._handleInvokeMethod,
+            QWebChannelMessageTypes.connectToSignal: self._handleConnectToSignal,
+            QWebChannelMessageTypes.disconnectFromSignal: self._handleDisconnectFromSignal,
+            QWebChannelMessageTypes.setProperty: self._handleSetProperty,
+        }
+
+        # pass on messages once the upstream channel has processed them. Property
+        # updates are forwarded entry by entry, as the upstream channel applies
+        # large ones while they are received if streaming, see pywebchannel.streaming
+        self._forwardAfter(QWebChannelMessageTypes.signal, self._forwardSignal)
+        self._hookUpstream('_updateObject', self._forwardUpdateEntry)
+        self._hookUpstream('_propertyUpdateDone', self._flushIdleSessions)
+
+        self._upstreamInitCallback = upstream.initCallback
+        upstream.initCallback = self._upstreamInitialized
+
+    def _forwardAfter(self, messageType, forward):
+        handler = self.upstream._messageHandlers[messageType]
+
+        def dispatch(message):
+            handler(message)
+            forward(message)
+
+        self.upstream._messageHandlers[messageType] = dispatch
+
+    def _hookUpstream(self, name, forward):
+        method = getattr(self.upstream, name)
+
+        def hooked(*args):
+            method(*args)
+            forward(*args)
+
+        setattr(self.upstream, name, hooked)
+
+    def _upstreamInitialized(self, webChannel):
+        if self._upstreamInitCallback is not None:
+            self._upstreamInitCallback(webChannel)
+        pending, self._pendingInits = self._pendingInits, []
+        for session, message in pending:
+            if session in self.sessions:
+                self._handleInit(session, message)
+
+    def disconnect(self, session):
+        super().disconnect(session)
+        for objectId, signalIndex in session.subscriptions:
+            self._release(objectId, signalIndex)
+        session.subscriptions.clear()
+
+    def _wrap(self, session, value):
+        """Converts a value from the upstream channel for sending to session.
+
+        QObjects are replaced by references, which include the descriptor if
+        session does not know the object yet. Lists and dicts are only copied
+        if they contain a QObject."""
+        if isinstance(value, QObject):
+            wrapped = {_QOBJECT_MARKER: True, "id": value._id}
+            if value._id not in session.knownObjects:
+                session.knownObjects.add(value._id)
+                wrapped["data"] = self._describe(session, value._id)
+            return wrapped
+
+        if isinstance(value, list):
+            items = enumerate(value)
+        elif isinstance(value, dict):
+            items = value.items()
+        else:
+            return value
+
+        result = value
+        for key, item in items:
+            if isinstance(item, (QObject, list, dict)):
+                wrapped = self._wrap(session, item)
+                if wrapped is not item:
+                    if result is value:
+                        result = type(value)(value)
+                    result[key] = wrapped
+        return result
+
+    def _describe(self, session, objectId):
+        """Returns the descriptor of an upstream object, as sent in the init message."""
+        upstream = self.upstream
+        qObject = upstream._loadedObject(objectId)
+        if qObject is None:
+            # not created yet in lazy mode; its descriptor is kept up to date
+            data = upstream.objects._descriptors[objectId]
+            return dict(data, properties=[
+                prop[:3] + [self._wrap(session, self._unwrapper._unwrapQObject(prop[3]))]
+                for prop in data["properties"]])
+
+        methods, properties, signals, enums = type(qObject)._schema
+        cache = qObject._propertyCache
+        values = []
+        for prop in properties:
+            value = cache[prop[0]]
+            if type(value) is _Unresolved:
+                value = qObject._resolveProperty(prop[0])
+            values.append(self._wrap(session, value))
+        return {
+            "methods": [list(method) for method in methods],
+            "properties": [[prop[0], prop[1], list(prop[2]) if prop[2] else [], value]
+                           for prop, value in zip(properties, values)],
+            "signals": [list(signal) for signal in signals],
+            "enums": dict((name, dict(values)) for name, values in enums),
+        }
+
+    def _handleInit(self, session, message):
+        if not self.upstream.isInitialized():
+            self._pendingInits.append((session, message))
+            return
+
+        session.pendingUpdates.clear()
+        names = list(self.upstream.objects)
+        # objects referencing each other only need their ids
+        session.knownObjects.update(names)
+        data = dict((name, self._describe(session, name)) for name in names)
+        session.send({"type": QWebChannelMessageTypes.response, "id": message["id"], "data": data})
+
+    def _handleIdle(self, session, message):
+        session.idle = True
+        if session.pendingUpdates:
+            self._flush(session)
+
+    def _handleDebug(self, session, message):
+        self.upstream.debug(message.get("data"))
+
+    def _handleInvokeMethod(self, session, message):
+        request = dict(message)
+        requestId = request.pop("id", None)
+        if requestId is None:
+            self.upstream.exec_(request)
+            return
+
+        def respond(data):
+            if session not in self.sessions:
+                return
+            if self.upstream._mayContainQObjects:
+                data = self._wrap(session, self._unwrapper._unwrapQObject(data))
+            session.send({"type": QWebChannelMessageTypes.response, "id": requestId, "data": data})
+
+        self.upstream.exec_(request, respond)
+
+    def _handleSetProperty(self, session, message):
+        self.upstream.exec_(dict(message))
+
+    def _signal(self, objectId, signalIndex):
+        qObject = self.upstream.objects.get(objectId)
+        if qObject is None:
+            print("Cannot find object " + str(objectId))
+            return None
+        return Signal(qObject, signalIndex, qObject._signalNames.get(signalIndex, str(signalIndex)),
+                      signalIndex in qObject._notifySignals)
+
+    def _handleConnectToSignal(self, session, message):
+        key = (message.get("object"), message.get("signal"))
+        if key in session.subscriptions:
+            return
+        refs = self._signalRefs.get(key, 0)
+        if refs == 0:
+            signal = self._signal(*key)
+            if signal is None:
+                return
+            signal.connect(_keepConnected)
+        self._signalRefs[key] = refs + 1
+        session.subscriptions.add(key)
+
+    def _handleDisconnectFromSignal(self, session, message):
+        key = (message.get("object"), message.get("signal"))
+        if key in session.subscriptions:
+            session.subscriptions.remove(key)
+            self._release(*key)
+
+    def _release(self, objectId, signalIndex):
+        key = (objectId, signalIndex)
+        refs = self._signalRefs.pop(key) - 1
+        if refs > 0:
+            self._signalRefs[key] = refs
+            return
+        signal = self._signal(objectId, signalIndex)
+        if signal is not None:
+            signal.disconnect(_keepConnected)
+
+    def _forwardSignal(self, message):
+        objectId = message["object"]
+        key = (objectId, message["signal"])
+        qObject = self.upstream._loadedObject(objectId)
+        destroyed = qObject is not None and qObject._signalNames.get(message["signal"]) == "destroyed"
+
+        args = message.get("args", [])
+        if self.upstream._mayContainQObjects:
+            args = self._unwrapper._unwrapQObject(args)
+        for session in self.sessions:
+            # like Qt, always send destroyed to clients knowing the object
+            if key in session.subscriptions or (destroyed and objectId in session.knownObjects):
+                session.send({"type": QWebChannelMessageTypes.signal, "object": objectId,
+                              "signal": message["signal"], "args": self._wrap(session, args)})
+
+    def _forwardUpdateEntry(self, entry):
+        """Merges one entry of a propertyUpdate into the pending updates of the clients."""
+        upstream = self.upstream
+        rewrap = upstream._mayContainQObjects
+        objectId = entry["object"]
+        qObject = upstream._loadedObject(objectId) if rewrap else None
+        for session in self.sessions:
+            # also skips clients which are not initialized yet
+            if objectId not in session.knownObjects:
+                continue
+            signals, properties = session.pendingUpdates.setdefault(objectId, ({}, {}))
+            if rewrap:
+                # use the values unwrapped by the upstream channel; properties
+                # first, as clients unwrap them before the signal arguments
+                for key in entry["properties"]:
+                    value = entry["properties"][key]
+                    if qObject is not None:
+                        value = qObject._propertyCache[qObject._propertyKeys[key]]
+                    properties[key] = self._wrap(session, value)
+                for key, args in entry["signals"].items():
+                    signals[key] = self._wrap(session, self._unwrapper._unwrapQObject(args))
+            else:
+                signals.update(entry["signals"])
+                properties.update(entry["properties"])
+
+    def _flushIdleSessions(self):
+        """Sends the pending updates to the clients which have processed the previous ones."""
+        for session in self.sessions:
+            if session.idle and session.pendingUpdates:
+                self._flush(session)
+
+    def _flush(self, session):
+        pending, session.pendingUpdates = session.pendingUpdates, {}
+        session.idle = False
+        session.send({
+            "type": QWebChannelMessageTypes.propertyUpdate,
+            "data": [{"object": objectId, "signals": signals, "properties": properties}
+                     for objectId, (signals, properties) in pending.items()],
+        })
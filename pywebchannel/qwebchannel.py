@@ -2,8 +2,18 @@
 
 from __future__ import absolute_import, division, print_function
 
+from .codec import defaultCodec
+import collections
+import collections.abc
+import hashlib
+import heapq
+import itertools
 import json
+import re
 import sys
+import threading
+import time
+import traceback
 import enum
 import inspect
 
@@ -21,71 +31,548 @@ class QWebChannelMessageTypes(enum.IntEnum):
     response = 10
 
 
+# Key marking a QObject in a message, see QObject._unwrapQObject()
+_QOBJECT_MARKER = "__QObject*__"
+_QOBJECT_MARKER_RE = re.compile(re.escape(_QOBJECT_MARKER.encode('utf-8')))
+
+
+def _mayContainQObjects(data):
+    """Returns False if the encoded message data cannot contain a QObject."""
+    if isinstance(data, str):
+        return _QOBJECT_MARKER in data
+    # also works on memoryviews, other than the in operator
+    return _QOBJECT_MARKER_RE.search(data) is not None
+
+
+class QWebChannelError(Exception):
+    """Base class for errors reported to pending calls."""
+
+
+class CallTimeoutError(QWebChannelError, TimeoutError):
+    """The response to a call did not arrive in time."""
+
+
+class ConnectionClosedError(QWebChannelError, ConnectionError):
+    """The connection was closed before the response to a call arrived."""
+
+
+class _PendingCall(object):
+    __slots__ = ('callback', 'errback', 'message', 'timer', 'sent')
+
+    def __init__(self, callback, errback, message):
+        self.callback = callback
+        self.errback = errback
+        self.message = message
+        self.timer = None
+        self.sent = False
+
+
+class _Timer(object):
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Batch(object):
+    '''Context manager queuing all messages sent by a QWebChannel, see QWebChannel.batch().'''
+
+    def __init__(self, webChannel):
+        self._webChannel = webChannel
+        self._outer = None
+        self.messages = []
+
+    def __enter__(self):
+        self._outer = self._webChannel._batch
+        if self._outer is None:
+            self._webChannel._batch = self
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._outer is not None:
+            # nested batches are sent with the outermost one
+            self._outer.messages.extend(self.messages)
+        else:
+            self._webChannel._batch = None
+            if self.messages:
+                self._webChannel.sendBatch(self.messages)
+        self.messages = []
+
+
+class LazyObjects(collections.abc.MutableMapping):
+    '''Mapping of object names to QObjects, used as QWebChannel.objects in lazy mode.
+
+    Keeps the descriptors from the init message and only creates the QObject
+    (and unwraps its properties) when it is first accessed.'''
+
+    def __init__(self, webChannel):
+        self._webChannel = webChannel
+        self._objects = {}
+        self._descriptors = {}
+        # Objects may be first accessed from several threads at once
+        self._lock = threading.RLock()
+
+    def addDescriptors(self, descriptors):
+        """Adds the object descriptors of an init message."""
+        self._descriptors.update(descriptors)
+
+    def loaded(self, name):
+        """Returns the QObject called name if it has been created already, else None."""
+        return self._objects.get(name)
+
+    def updateProperties(self, name, propertyMap):
+        """Applies a property update to the descriptor of an object which has not been created yet."""
+        changed = []
+        for prop in self._descriptors[name]["properties"]:
+            key = str(prop[0])
+            if key in propertyMap:
+                prop[3] = propertyMap[key]
+                changed.append(int(prop[0]))
+        self._webChannel._recordChanges(name, changed)
+
+    def __getitem__(self, name):
+        try:
+            return self._objects[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            qObject = self._objects.get(name)
+            if qObject is None:
+                # registers itself through __setitem__, which drops the descriptor.
+                # Its properties are unwrapped when they are first read.
+                qObject = self._webChannel.QObjectType(name, self._descriptors[name], self._webChannel)
+            return qObject
+
+    def __setitem__(self, name, qObject):
+        self._descriptors.pop(name, None)
+        self._objects[name] = qObject
+
+    def __delitem__(self, name):
+        if name in self._objects:
+            del self._objects[name]
+        else:
+            del self._descriptors[name]
+
+    def __contains__(self, name):
+        return name in self._objects or name in self._descriptors
+
+    def __iter__(self):
+        yield from list(self._objects)
+        yield from list(self._descriptors)
+
+    def __len__(self):
+        return len(self._objects) + len(self._descriptors)
+
+
+class _Unresolved(object):
+    '''Property value which may still contain references to other QObjects, in lazy mode.'''
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+PropertyChange = collections.namedtuple('PropertyChange', ('object', 'property', 'version', 'timestamp'))
+
+
+class PropertySnapshot(collections.abc.Mapping):
+    '''Property values of a QObject at the time of QWebChannel.snapshot(), by property name.
+
+    The values are not copied: the snapshot shares the property cache of the
+    QObject, which copies it before the next change.'''
+
+    __slots__ = ('_qObject', '_cls', '_values')
+
+    def __init__(self, qObject, values):
+        self._qObject = qObject
+        self._cls = type(qObject)
+        self._values = values
+
+    def __getitem__(self, name):
+        propertyIndex = self._cls._propertyKeys.get(name)
+        if propertyIndex is None or self._cls._propertyNames[propertyIndex] != name:
+            raise KeyError(name)
+        value = self._values[propertyIndex]
+        if type(value) is _Unresolved:
+            value = self._qObject._unwrapQObject(value.value)
+        return value
+
+    def __iter__(self):
+        return iter(self._cls._propertyNames.values())
+
+    def __len__(self):
+        return len(self._cls._propertyNames)
+
+
+def _schemaKey(data):
+    """Returns a hashable key describing the interface of an object, ignoring property values."""
+    return (tuple(tuple(method) for method in data["methods"]),
+            tuple((prop[0], prop[1], tuple(prop[2]) if prop[2] else None)
+                  for prop in data["properties"]),
+            tuple(tuple(signal) for signal in data["signals"]),
+            tuple((name, tuple(values.items())) for name, values in data.get("enums", {}).items()))
+
+
+def _schemaHash(schema):
+    """Returns a stable hash of a schema key, see _schemaKey()."""
+    return hashlib.sha1(repr(schema).encode('utf-8')).hexdigest()
+
+
 class QWebChannel(object):
 
     # set to QObject further down
     QObjectType = None
 
-    def __init__(self, initCallback=None):
+    def __init__(self, initCallback=None, codec=None, timeout=None, maxPendingCalls=None,
+                 lazy=False, instrument=False, pendingCallPolicy="fail"):
+        if pendingCallPolicy not in ("fail", "replay"):
+            raise ValueError("Invalid pending call policy: " + str(pendingCallPolicy))
+
         self.initCallback = initCallback
+        self.codec = codec if codec is not None else defaultCodec()
         self.__initialized = False
-        self.objects = {}
+        # In lazy mode, QObjects are only created when accessed through self.objects
+        self.lazy = lazy
+        self.objects = LazyObjects(self) if lazy else {}
         self.execCallbacks = {}
         self.execId = 0
 
+        # Default timeout in seconds for calls expecting a response
+        self.timeout = timeout
+        # Maximum number of calls awaiting a response. Further calls are
+        # queued and only sent once a response arrives.
+        self.maxPendingCalls = maxPendingCalls
+        self._execBacklog = collections.deque()
+        self._inFlight = 0
+
+        # What happens to pending calls when the connection is closed: with
+        # "fail", they fail with ConnectionClosedError; with "replay", they are
+        # sent again once the channel is initialized on the next connection.
+        self.pendingCallPolicy = pendingCallPolicy
+        # True while calls are held back for replay
+        self._holdCalls = False
+
+        # Heap of timers, processed by runTimers()
+        self._timers = []
+        self._timerSeq = itertools.count()
+        self._compactTimersAt = 64
+
+        # The active Batch, if any
+        self._batch = None
+
+        # False while handling a message which contains no QObjects, so
+        # that unwrapping its payload can be skipped
+        self._mayContainQObjects = True
+
+        # ChannelStats, if instrumentation is enabled
+        self.stats = None
+        if instrument:
+            self.enableStats()
+
+        # TraceRecorder from pywebchannel.trace, if traffic is recorded
+        self.recorder = None
+
+        # Whether the transport takes bytes, see connection_made()
+        self._binaryTransport = False
+
+        # Message type -> handler. Until the channel is initialized, only
+        # responses are handled, as all objects have to be created first.
+        self._initMessageHandlers = {
+            QWebChannelMessageTypes.response: self.handleResponse,
+        }
+        self._messageHandlers = {
+            QWebChannelMessageTypes.response: self.handleResponse,
+            QWebChannelMessageTypes.signal: self.handleSignal,
+            QWebChannelMessageTypes.propertyUpdate: self.handle_propertyUpdate,
+        }
+        self._handlers = self._initMessageHandlers
+
+        # Object name -> generated proxy class, see useGeneratedProxies()
+        self._generatedProxies = {}
+
+        # Version of the last property change while change tracking is enabled
+        self.version = 0
+        # (object name, property index) -> (version, timestamp) of its last
+        # change, ordered by version; None unless change tracking is enabled
+        self._changes = None
+        # Names of the objects whose property cache is shared with a snapshot
+        self._sharedCaches = set()
+
+    def enableStats(self):
+        """Enables collection of statistics and returns the ChannelStats."""
+        if self.stats is None:
+            from .stats import ChannelStats
+            self.stats = ChannelStats(self)
+        return self.stats
+
+    def disableStats(self):
+        self.stats = None
+
+    def enableChangeTracking(self):
+        """Starts recording a version and timestamp for every property change, see changesSince()."""
+        if self._changes is None:
+            self._changes = collections.OrderedDict()
+
+    def disableChangeTracking(self):
+        self._changes = None
+
+    def useGeneratedProxies(self, module):
+        """Uses the proxy classes of a module generated by pywebchannel.codegen.
+
+        They are used for objects whose schema matches the one the module was
+        generated from; other objects get a dynamically built class as usual."""
+        self._generatedProxies.update(module.PROXIES)
+
+    def isInitialized(self):
+        """Returns whether the objects of the current connection have been created."""
+        return self.__initialized
+
     def initialized(self):
         self.__initialized = True
+        self._handlers = self._messageHandlers
         if (self.initCallback):
             self.initCallback(self)
 
     def connection_made(self, transport):
         self.transport = transport
-
-        def callback(data):
+        # text codecs encode to bytes for transports taking them, see transports.Transport
+        self._binaryTransport = getattr(transport, 'binary', False)
+        # objects of a previous connection are updated in place
+        self._reconnected = len(self.objects) > 0
+
+        # the init call has to go out before any held calls
+        held, self._holdCalls = self._holdCalls, False
+        self._initId = self.exec_({"type": QWebChannelMessageTypes.init}, self._handleInit)
+        self._holdCalls = held
+
+    def _handleInit(self, data):
+        if self._reconnected:
+            self._resync(data)
+        else:
             for objectName in data:
-                self.QObjectType(objectName, data[objectName], self);
+                self._addObject(objectName, data[objectName])
+            self._unwrapAllProperties()
+        self._finishInit()
+
+    def _addObject(self, objectName, data):
+        """Creates the QObject for one descriptor of the init message."""
+        if self.lazy:
+            self.objects.addDescriptors({objectName: data})
+        else:
+            self.QObjectType(objectName, data, self)
 
-            # now unwrap properties, which might reference other registered objects
+    def _unwrapAllProperties(self):
+        # properties might reference other registered objects, so unwrap them once all exist
+        if self._mayContainQObjects and not self.lazy:
             for objectName in self.objects.copy():
-                self.objects[objectName]._unwrapProperties();
+                self.objects[objectName]._unwrapProperties()
 
-            self.initialized()
+    def _finishInit(self):
+        if self._holdCalls:
+            # replay the calls pending when the previous connection was closed
+            self._holdCalls = False
+            self._sendBacklog()
 
-            if self.__initialized:
-                self.exec_({"type": QWebChannelMessageTypes.idle});
+        self.initialized()
 
-        self.exec_({"type": QWebChannelMessageTypes.init}, callback)
+        if self.__initialized:
+            self.exec_({"type": QWebChannelMessageTypes.idle})
 
     def connection_closed(self):
         self.__initialized = False
+        self._handlers = self._initMessageHandlers
+        if self.pendingCallPolicy == "replay":
+            self._holdPendingCalls()
+        else:
+            self._failPendingCalls(ConnectionClosedError, "Connection closed")
+
+    def _holdPendingCalls(self):
+        """Queues all pending calls again, to be sent on the next connection."""
+        # except an unanswered init call, as the next connection sends its own
+        init = self.execCallbacks.pop(self._initId, None)
+        if init is not None:
+            if not init.sent:
+                self._execBacklog.remove(self._initId)
+            if init.timer is not None:
+                init.timer.cancel()
+            if self.stats is not None:
+                self.stats.callDropped(self._initId, "cancelled")
+        sent = [execId for execId, call in self.execCallbacks.items() if call.sent]
+        for execId in sent:
+            self.execCallbacks[execId].sent = False
+        self._execBacklog.extendleft(reversed(sent))
+        self._inFlight = 0
+        self._holdCalls = True
+
+    def _resync(self, data):
+        """Updates the existing QObjects from the init message of a new connection.
+
+        Properties are patched in place and the notify signals of changed ones are
+        emitted with the new value. Objects no longer published emit destroyed and
+        are removed. Pure signals with callbacks are connected again."""
+        previous = {}
+        for objectName in list(self.objects):
+            qObject = self._loadedObject(objectName)
+            if objectName not in data:
+                if qObject is not None:
+                    qObject._emitDestroyed()
+                if objectName in self.objects:
+                    del self.objects[objectName]
+            elif qObject is not None:
+                # resolve values left unresolved in lazy mode, to compare them with the new ones
+                previous[objectName] = [qObject._resolveProperty(propertyIndex) if type(value) is _Unresolved else value
+                                        for propertyIndex, value in enumerate(qObject._propertyCache)]
+                qObject._resync(data[objectName])
+
+        if self.lazy:
+            self.objects.addDescriptors(dict((name, desc) for name, desc in data.items()
+                                             if name not in previous))
+        else:
+            for objectName in data:
+                if objectName not in previous:
+                    self.QObjectType(objectName, data[objectName], self)
+
+        # unwrap all properties first, as they might reference other objects
+        for objectName in previous:
+            self.objects[objectName]._unwrapProperties()
+        if not self.lazy:
+            for objectName in data:
+                if objectName not in previous:
+                    self.objects[objectName]._unwrapProperties()
+
+        if self._changes is not None:
+            for objectName, oldValues in previous.items():
+                cache = self.objects[objectName]._propertyCache
+                self._recordChanges(objectName, [propertyIndex for propertyIndex, value in enumerate(cache)
+                                                 if propertyIndex >= len(oldValues)
+                                                 or oldValues[propertyIndex] != value])
+
+        with self.batch():
+            for objectName, oldValues in previous.items():
+                self.objects[objectName]._reconnectSignals()
+            for objectName, oldValues in previous.items():
+                self.objects[objectName]._notifyChangedProperties(oldValues)
+
+    def _failPendingCalls(self, errorType, reason):
+        """Removes all pending calls and reports errorType(reason) to them."""
+        calls = self.execCallbacks
+        self.execCallbacks = {}
+        self._execBacklog.clear()
+        self._inFlight = 0
+        self._holdCalls = False
+
+        if self.stats is not None:
+            for execId in calls:
+                self.stats.callDropped(execId, "failed")
+
+        for call in calls.values():
+            if call.timer is not None:
+                call.timer.cancel()
+            if call.errback is not None:
+                call.errback(errorType(reason))
+
+    def _callLater(self, delay, callback, *args):
+        """Schedules callback(*args) after delay seconds and returns a handle with a cancel() method."""
+        if len(self._timers) >= self._compactTimersAt:
+            # drop cancelled timers, e.g. timeouts of calls that got a response
+            self._timers = [entry for entry in self._timers if not entry[2].cancelled]
+            heapq.heapify(self._timers)
+            self._compactTimersAt = max(64, 2 * len(self._timers))
+
+        timer = _Timer(time.monotonic() + delay, callback, args)
+        heapq.heappush(self._timers, (timer.when, next(self._timerSeq), timer))
+        return timer
+
+    def runTimers(self):
+        """Invokes expired timers, e.g. for call timeouts or rate-limited signal callbacks.
+
+        Called whenever a message is received. Applications using timeouts or
+        rate limits with this class should also call it periodically from their event loop."""
+        timers = self._timers
+        now = time.monotonic()
+        while timers and timers[0][0] <= now:
+            timer = heapq.heappop(timers)[2]
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+
+    def batch(self):
+        """Returns a context manager that queues all messages sent within it.
+
+        The queued messages are passed to sendBatch() when leaving the outermost batch."""
+        return Batch(self)
+
+    def _post(self, data):
+        if self._batch is not None:
+            self._batch.messages.append(data)
+        else:
+            self.send(data)
+
+    def sendBatch(self, messages):
+        """Sends several messages at once. Subclasses may override this to write them in one go."""
+        for data in messages:
+            self.send(data)
 
     def send(self, data):
-        if not isinstance(data, str):
-            data = json.dumps(data)
+        message = data
+        if isinstance(data, str):
+            pass
+        elif self.codec.binary or self._binaryTransport:
+            data = self.codec.encode(data)
+        else:
+            data = self.codec.encodeText(data)
+        if self.stats is not None:
+            # the size of str messages is counted in characters
+            self.stats.messageSent(message, len(data))
+        if self.recorder is not None:
+            self.recorder.sent(data)
         self.transport.send(data)
 
     def message_received(self, data):
-        if isinstance(data, str):
-            data = json.loads(data)
+        if self.recorder is not None:
+            self.recorder.received(data)
 
-        if data["type"] == QWebChannelMessageTypes.response:
-            self.handleResponse(data);
-            return
+        size = None
+        if not isinstance(data, dict):
+            size = len(data)
+            self._mayContainQObjects = _mayContainQObjects(data)
+            data = self.codec.decode(data)
 
-        if not self.__initialized:
-            return  # All objects have to be created first!
+        if self.stats is not None:
+            self.stats.messageReceived(data, size)
 
-        if data["type"] == QWebChannelMessageTypes.signal:
-            self.handleSignal(data);
-        elif data["type"] == QWebChannelMessageTypes.propertyUpdate:
-            self.handle_propertyUpdate(data);
-        else:
+        try:
+            self._handleMessage(data)
+        finally:
+            self._mayContainQObjects = True
+
+        if self._timers:
+            # e.g. expired calls or coalesced signal callbacks
+            self.runTimers()
+
+    def _handleMessage(self, data):
+        handler = self._handlers.get(data["type"])
+        if handler is not None:
+            handler(data)
+        elif self.__initialized or data["type"] not in self._messageHandlers:
             print("invalid message received: ", data)
 
-    def exec_(self, data, callback=None):
+    def exec_(self, data, callback=None, errback=None, timeout=None):
+        """Sends data. If callback is given, it is invoked with the response.
+
+        Returns the id of the call, which can be passed to cancelExec().
+        errback is invoked with an exception if the call times out after timeout
+        seconds (defaulting to self.timeout) or the connection is closed."""
         if not callback:
             # if no callback is given, send directly
-            self.send(data);
+            self._post(data);
             return
 
         if self.execId == sys.maxsize:
@@ -96,16 +583,85 @@ class QWebChannel(object):
             print("Cannot exec message with property id: " + json.dumps(data))
             return
 
-        data["id"] = self.execId;
+        execId = data["id"] = self.execId;
         self.execId = self.execId + 1
-        self.execCallbacks[data["id"]] = callback;
-
-        self.send(data);
+        call = self.execCallbacks[execId] = _PendingCall(callback, errback, data)
+        if self.stats is not None:
+            self.stats.callStarted(execId, data)
+
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is not None:
+            call.timer = self._callLater(timeout, self._expireCall, execId)
+
+        if self._holdCalls or (self.maxPendingCalls is not None
+                               and self._inFlight >= self.maxPendingCalls):
+            self._execBacklog.append(execId)
+        else:
+            self._sendCall(call)
+
+        return execId
+
+    def _sendCall(self, call):
+        call.sent = True
+        self._inFlight += 1
+        self._post(call.message)
+
+    def _sendBacklog(self):
+        while self._execBacklog and not self._holdCalls and (self.maxPendingCalls is None
+                                                             or self._inFlight < self.maxPendingCalls):
+            self._sendCall(self.execCallbacks[self._execBacklog.popleft()])
+
+    def _hasCapacity(self):
+        """Returns whether another call would be sent right away."""
+        if self._holdCalls:
+            return False
+        return self.maxPendingCalls is None or (not self._execBacklog
+                                                and self._inFlight < self.maxPendingCalls)
+
+    def _popCall(self, execId):
+        call = self.execCallbacks.pop(execId, None)
+        if call is None:
+            return None
+
+        if call.timer is not None:
+            call.timer.cancel()
+
+        if call.sent:
+            self._inFlight -= 1
+            self._sendBacklog()
+        else:
+            self._execBacklog.remove(execId)
+        return call
+
+    def cancelExec(self, execId):
+        """Drops a pending call, so that its callbacks will not be invoked.
+
+        Returns False if there is no such call."""
+        if self.stats is not None:
+            self.stats.callDropped(execId, "cancelled")
+        return self._popCall(execId) is not None
+
+    def _expireCall(self, execId):
+        if self.stats is not None:
+            self.stats.callDropped(execId, "timeout")
+        call = self._popCall(execId)
+        if call is not None and call.errback is not None:
+            call.errback(CallTimeoutError("No response to call {} received in time".format(execId)))
+
+    def _loadedObject(self, name):
+        """Returns the QObject called name, without creating it in lazy mode."""
+        if self.lazy:
+            return self.objects.loaded(name)
+        return self.objects.get(name, None)
 
     def handleSignal(self, message):
-        object = self.objects.get(message["object"], None);
+        objects = self.objects
+        object = objects.loaded(message["object"]) if self.lazy else objects.get(message["object"])
         if object is not None:
             object._signalEmitted(message["signal"], message.get("args", []));
+        elif message["object"] in self.objects:
+            pass  # not created yet, so nothing can be connected to it
         else:
             print("Unhandled signal: " + str(message.get("object")) + "::" + str(message.get("signal")))
 
@@ -114,53 +670,256 @@ class QWebChannel(object):
             print("Invalid response message received: ", json.dumps(message))
             return
 
-        self.execCallbacks[message["id"]](message["data"])
-        del self.execCallbacks[message["id"]];
+        if self.stats is not None:
+            self.stats.callFinished(message["id"])
+
+        call = self._popCall(message["id"])
+        if call is not None:
+            # otherwise the call has timed out or was cancelled
+            call.callback(message["data"])
 
     def handle_propertyUpdate(self, message):
         for data in message["data"]:
-            qObject = self.objects.get(data["object"], None);
-            if qObject is not None:
-                qObject._propertyUpdate(data["signals"], data["properties"]);
-            else:
-                print("Unhandled property update for " + str(data.get("object")))
+            self._updateObject(data)
+        self._propertyUpdateDone()
+
+    def _updateObject(self, data):
+        """Applies one entry of a propertyUpdate message."""
+        qObject = self._loadedObject(data["object"])
+        if qObject is not None:
+            qObject._propertyUpdate(data["signals"], data["properties"])
+        elif data["object"] in self.objects:
+            self.objects.updateProperties(data["object"], data["properties"])
+        else:
+            print("Unhandled property update for " + str(data.get("object")))
+
+    def _propertyUpdateDone(self):
         if self.__initialized:
             self.exec_({"type": QWebChannelMessageTypes.idle});
 
+    def connectSignals(self, connections, **options):
+        """Connects each (signal, callback) pair in connections, see Signal.connect().
+
+        The resulting messages are sent at once."""
+        with self.batch():
+            for signal, callback in connections:
+                signal.connect(callback, **options)
+
+    def disconnectSignals(self, connections):
+        """Disconnects each (signal, callback) pair in connections, sending the resulting messages at once."""
+        with self.batch():
+            for signal, callback in connections:
+                signal.disconnect(callback)
+
+    def _recordChanges(self, objectName, propertyIndices):
+        """Assigns the next versions to changed properties of an object."""
+        changes = self._changes
+        if changes is None:
+            return
+        version = self.version
+        now = time.time()
+        for propertyIndex in propertyIndices:
+            key = (objectName, propertyIndex)
+            version += 1
+            changes[key] = (version, now)
+            # keep the changes ordered by version
+            changes.move_to_end(key)
+        self.version = version
+
+    def _propertyName(self, objectName, propertyIndex):
+        qObject = self._loadedObject(objectName)
+        if qObject is not None:
+            return qObject._propertyNames.get(propertyIndex)
+        if objectName in self.objects:
+            for prop in self.objects._descriptors[objectName]["properties"]:
+                if int(prop[0]) == propertyIndex:
+                    return prop[1]
+        return None
+
+    def propertyVersion(self, objectName, propertyName):
+        """Returns the version and time.time() of the last change of a property.
+
+        Returns None if it has not changed since change tracking was enabled."""
+        if self._changes is None:
+            raise RuntimeError("Change tracking is not enabled")
+        qObject = self._loadedObject(objectName)
+        if qObject is not None:
+            propertyIndex = qObject._propertyKeys.get(propertyName)
+        elif self.lazy:
+            # not created yet, look the property up in its descriptor
+            propertyIndex = None
+            for prop in self.objects._descriptors.get(objectName, {}).get("properties", ()):
+                if prop[1] == propertyName:
+                    propertyIndex = int(prop[0])
+        else:
+            return None
+        return self._changes.get((objectName, propertyIndex))
+
+    def changesSince(self, version):
+        """Returns the properties changed after version as PropertyChange tuples, oldest first.
+
+        Each property is reported once, with its latest change. Takes time
+        proportional to the number of changed properties, not of all properties.
+        Pass the version attribute read at the last poll."""
+        if self._changes is None:
+            raise RuntimeError("Change tracking is not enabled")
+        changes = []
+        for key in reversed(self._changes):
+            changeVersion, timestamp = self._changes[key]
+            if changeVersion <= version:
+                break
+            propertyName = self._propertyName(*key)
+            if propertyName is not None:
+                changes.append(PropertyChange(key[0], propertyName, changeVersion, timestamp))
+        changes.reverse()
+        return changes
+
+    def snapshot(self, objectNames=None):
+        """Returns the current property values of objects, as dict of object name -> PropertySnapshot.
+
+        Without objectNames, all objects are included, which creates them in lazy
+        mode. Nothing is copied until a property of a snapshotted object changes."""
+        if objectNames is None:
+            objectNames = list(self.objects)
+        snapshots = {}
+        for objectName in objectNames:
+            qObject = self.objects[objectName]
+            self._sharedCaches.add(objectName)
+            snapshots[objectName] = PropertySnapshot(qObject, qObject._propertyCache)
+        return snapshots
+
     def debug(self, message):
         self.send({"type": QWebChannelMessageTypes.debug, "data": message});
 
 
 class QObject(object):
 
+    __slots__ = ('_id', '_webChannel', '_objectSignals', '_propertyCache', '__weakref__')
+
+    # Proxy classes created so far, keyed by base class, object schema and generated class
+    _proxyClasses = {}
+
     def __init__(self, name, data, webChannel):
         self._id = name;
         self._webChannel = webChannel
         webChannel.objects[name] = self;
 
-        # override the class so that we can dynamically add properties
-        cls = self.__class__
-        self.__class__ = type(cls.__name__ + '-' + name, (cls,), {})
-        self.__class__.__doc__ = "Interface for remote object {0}".format(name)
-
-        # List of callbacks that get invoked upon signal emission
-        self._objectSignals = {};
-
-        # Cache of all properties, updated when a notify signal is emitted
-        self._propertyCache = {};
+        # Signal index -> list of callbacks that get invoked upon signal
+        # emission. Only allocated when the first callback is connected.
+        self._objectSignals = None
 
-        for method in data["methods"]:
-            self._addMethod(method)
+        # Cache of all properties by index, updated when a notify signal is emitted
+        self._propertyCache = []
 
-        for prop in data["properties"]:
-            self._bindGetterSetter(prop)
+        self._setSchema(data)
+        self._setProperties(data)
 
-        for signal in data["signals"]:
-            self._addSignal(signal)
-
-        for name, values in data.get("enums", {}).items():
-            setattr(self.__class__, name, enum.IntEnum(name, values))
+    def _setSchema(self, data):
+        # override the class so that we can dynamically add properties.
+        # Objects with identical methods, properties, signals and enums share
+        # one class, so it only has to be built once per schema.
+        cls = self.__class__
+        if '_schema' in cls.__dict__:
+            # already a proxy class, e.g. when the schema changed on reconnect
+            cls = cls.__bases__[-1]
+        schema = _schemaKey(data)
+        generated = self._webChannel._generatedProxies.get(self._id)
+        if generated is not None and generated.SCHEMA_HASH != _schemaHash(schema):
+            generated = None
+        # generated classes are part of the key, so they are only used by
+        # channels that opted in, and never replaced by a dynamic class
+        key = (cls, self._webChannel.lazy, schema, generated)
+        proxyClass = QObject._proxyClasses.get(key)
+        if proxyClass is not None:
+            self.__class__ = proxyClass
+            return
 
+        if generated is not None:
+            if not issubclass(generated, cls):
+                # generated for another base class, e.g. the plain instead of the asyncio QObject
+                generated = type(cls.__name__ + '-' + generated.__name__, (generated, cls),
+                                 {'__slots__': (), '__doc__': generated.__doc__})
+            generated._schema = schema
+            self.__class__ = generated
+        else:
+            # shared by all objects with this schema, so named after the schema
+            self.__class__ = type(cls.__name__ + '-' + _schemaHash(schema)[:12], (cls,),
+                                  {'__slots__': ()})
+            self.__class__.__doc__ = "Interface for remote objects"
+            self.__class__._schema = schema
+            # method, signal and property index -> name, e.g. for statistics
+            self.__class__._methodNames = {}
+            self.__class__._signalNames = {}
+            self.__class__._propertyNames = {}
+            # signal and property keys as found in messages (int or str) -> index,
+            # property names -> index
+            self.__class__._signalKeys = {}
+            self.__class__._propertyKeys = {}
+            self.__class__._notifySignals = set()
+            # property index -> notify signal index
+            self.__class__._propertyNotifySignals = {}
+
+            for method in data["methods"]:
+                self._addMethod(method)
+
+            for prop in data["properties"]:
+                self._bindGetterSetter(prop)
+
+            for signal in data["signals"]:
+                self._addSignal(signal)
+
+            for enumName, values in data.get("enums", {}).items():
+                setattr(self.__class__, enumName, enum.IntEnum(enumName, values))
+
+        QObject._proxyClasses[key] = self.__class__
+
+    def _setProperties(self, data):
+        # initialize property cache with current values
+        # NOTE: if this is an object, it is not directly unwrapped as it might
+        # reference other QObject that we do not know yet. In lazy mode, this
+        # is done by the getter when the property is first read.
+        lazy = self._webChannel.lazy
+        properties = data["properties"]
+        cache = [None] * (1 + max((int(prop[0]) for prop in properties), default=-1))
+        for prop in properties:
+            value = prop[3]
+            if lazy and isinstance(value, (dict, list)):
+                value = _Unresolved(value)
+            cache[int(prop[0])] = value
+        self._propertyCache = cache
+
+    def _resync(self, data):
+        """Applies the descriptor of this object from the init message of a new connection."""
+        if _schemaKey(data) != self.__class__._schema:
+            self._setSchema(data)
+        self._setProperties(data)
+
+    def _emitDestroyed(self):
+        for signalIndex, signalName in self._signalNames.items():
+            if signalName == "destroyed":
+                self._invokeSignalCallbacks(signalIndex, [])
+
+    def _reconnectSignals(self):
+        """Connects to all pure signals with callbacks again, e.g. after a reconnect."""
+        if self._objectSignals is None:
+            return
+        for signalIndex, callbacks in self._objectSignals.items():
+            if (callbacks and signalIndex not in self._notifySignals
+                    and self._signalNames.get(signalIndex) != "destroyed"):
+                self._webChannel.exec_({
+                    "type": QWebChannelMessageTypes.connectToSignal,
+                    "object": self._id,
+                    "signal": signalIndex
+                })
+
+    def _notifyChangedProperties(self, oldValues):
+        """Invokes the notify signal callbacks of properties whose value differs from oldValues.
+
+        The callbacks are passed the new value."""
+        for propertyIndex, signalIndex in self._propertyNotifySignals.items():
+            value = self._propertyCache[propertyIndex]
+            if propertyIndex >= len(oldValues) or oldValues[propertyIndex] != value:
+                self._invokeSignalCallbacks(signalIndex, [value])
 
     def __dir__(self):
         def keep(member):
@@ -171,18 +930,41 @@ class QObject(object):
 
         return [ x for x in super().__dir__() if keep(x) ]
 
+    def __repr__(self):
+        return "<{} {!r}>".format(type(self).__name__, self._id)
+
 
     def _unwrapQObject(self, response):
+        """Replaces QObject references in response by QObjects.
+
+        Lists and dicts are only copied if they contain a QObject, otherwise
+        response is returned unchanged."""
         if isinstance(response, list):
             # support list of objects
-            return [ self._unwrapQObject(object) for object in response ]
+            result = response
+            for i, value in enumerate(response):
+                if isinstance(value, (list, dict)):
+                    unwrapped = self._unwrapQObject(value)
+                    if unwrapped is not value:
+                        if result is response:
+                            result = list(response)
+                        result[i] = unwrapped
+            return result
 
         if not isinstance(response, dict):
             return response
         else:
             # Support QObjects as values in a map
-            if "__QObject*__" not in response or "id" not in response:
-                return { k: self._unwrapQObject(v) for k, v in response.items() }
+            if _QOBJECT_MARKER not in response or "id" not in response:
+                result = response
+                for k, value in response.items():
+                    if isinstance(value, (list, dict)):
+                        unwrapped = self._unwrapQObject(value)
+                        if unwrapped is not value:
+                            if result is response:
+                                result = dict(response)
+                            result[k] = unwrapped
+                return result
 
         objectId = response["id"];
         if objectId in self._webChannel.objects:
@@ -218,112 +1000,223 @@ class QObject(object):
 
     def _unwrapProperties(self):
         for propertyIdx in range(len(self._propertyCache)):
-            self._propertyCache[propertyIdx] = self._unwrapQObject(self._propertyCache[propertyIdx])
+            value = self._propertyCache[propertyIdx]
+            if isinstance(value, _Unresolved):
+                value = value.value
+            self._propertyCache[propertyIdx] = self._unwrapQObject(value)
 
     def _addSignal(self, signalData, propertyName=None):
         signalName = signalData[0];
         signalIndex = signalData[1];
 
         setattr(self.__class__, signalName, SignalDescriptor(signalIndex, signalName, propertyName))
+        self.__class__._signalNames[signalIndex] = signalName
+        self.__class__._signalKeys[signalIndex] = signalIndex
+        self.__class__._signalKeys[str(signalIndex)] = signalIndex
+        if propertyName is not None:
+            self.__class__._notifySignals.add(signalIndex)
 
     def _invokeSignalCallbacks(self, signalName, signalArgs):
         """Invokes all callbacks for the given signalname. Also works for property notify callbacks."""
-        try:
-            signalName = int(signalName)
-        except ValueError:
-            pass
-
-        if signalName not in self._objectSignals:
+        if self._objectSignals is None:
+            return
+        signalName = self._signalKeys.get(signalName, signalName)
+        callbacks = self._objectSignals.get(signalName)
+        if not callbacks:
             return
 
-        for callback in self._objectSignals[signalName]:
-            callback(*signalArgs)
+        stats = self._webChannel.stats
+        if stats is None:
+            for callback in callbacks:
+                callback(*signalArgs)
+        else:
+            for callback in callbacks:
+                start = time.perf_counter()
+                callback(*signalArgs)
+                stats.signalCallback(self, signalName, time.perf_counter() - start)
 
     def _propertyUpdate(self, signals, propertyMap):
         # update property cache
-        for propertyIndex in propertyMap:
-            propertyValue = propertyMap[propertyIndex]
-            self._propertyCache[int(propertyIndex)] = self._unwrapQObject(propertyValue)
-
-        for signalName in signals:
+        webChannel = self._webChannel
+        unwrap = webChannel._mayContainQObjects
+        cache = self._writableCache() if webChannel._sharedCaches else self._propertyCache
+        propertyKeys = self._propertyKeys
+        changed = None if webChannel._changes is None else []
+        for propertyIndex, propertyValue in propertyMap.items():
+            if unwrap:
+                propertyValue = self._unwrapQObject(propertyValue)
+            propertyIndex = propertyKeys[propertyIndex]
+            cache[propertyIndex] = propertyValue
+            if changed is not None:
+                changed.append(propertyIndex)
+        if changed:
+            webChannel._recordChanges(self._id, changed)
+
+        if self._objectSignals is None:
+            return
+        for signalName, signalArgs in signals.items():
             # Invoke all callbacks, as _signalEmitted() does not. This ensures the
             # property cache is updated before the callbacks are invoked.
-            self._invokeSignalCallbacks(signalName, signals[signalName]);
+            self._invokeSignalCallbacks(signalName, signalArgs);
+
+    def _writableCache(self):
+        """Returns the property cache for modification, copying it first if a snapshot shares it."""
+        shared = self._webChannel._sharedCaches
+        if shared and self._id in shared:
+            shared.discard(self._id)
+            self._propertyCache = list(self._propertyCache)
+        return self._propertyCache
 
     def _signalEmitted(self, signalName, signalArgs):
         self._invokeSignalCallbacks(signalName, signalArgs)
 
-    def _addMethod(self, methodData):
-        methodName = methodData[0];
-        methodIdx = methodData[1];
+    def _connectSignal(self, signal, callback):
+        """Adds callback to the callbacks of signal, see Signal.connect()."""
+        if self._objectSignals is None:
+            self._objectSignals = {}
+        callbacks = self._objectSignals.setdefault(signal._signalIndex, [])
+        callbacks.append(callback);
 
-        def method(self, *arguments):
-            args = []
-            callback = None
-            for arg in arguments:
-                if callable(arg):
-                    callback = arg
-                elif isinstance(arg, QObject) and arg._id in self._webChannel.objects:
-                    args.append({ "id": arg._id })
-                else:
-                    args.append(arg)
-
-            def responseCallback(response):
-                result = self._unwrapQObject(response)
-                if callback:
-                    callback(result)
+        if (len(callbacks) == 1 and not signal.isPropertyNotifySignal
+                and signal._signalName != "destroyed"):
+            # only required for "pure" signals, handled separately for properties in _propertyUpdate
+            # also note that we always get notified about the destroyed signal.
+            # The server only needs to know about the first callback.
+            self._webChannel.exec_({
+                "type": QWebChannelMessageTypes.connectToSignal,
+                "object": self._id,
+                "signal": signal._signalIndex
+            })
+
+    def _disconnectSignal(self, signal, callback):
+        """Removes callback from the callbacks of signal, see Signal.disconnect()."""
+        objectSignals = self._objectSignals
+        callbacks = objectSignals.get(signal._signalIndex, ()) if objectSignals else ()
+        for connected in callbacks:
+            if _unwrapCallback(connected) == callback:
+                break
+        else:
+            print("Cannot find connection of signal " + signal._signalName + " to " + str(callback))
+            return
+
+        callbacks.remove(connected)
+        while isinstance(connected, (_CoalescingCallback, _QueuedCallback)):
+            connected.cancel()
+            connected = connected.callback
+
+        if callbacks:
+            return
+        del objectSignals[signal._signalIndex]
 
+        if not signal.isPropertyNotifySignal and signal._signalName != "destroyed":
+            # only required for "pure" signals, handled separately for properties in _propertyUpdate
+            # the destroyed signal is always sent, so it was never connected
             self._webChannel.exec_({
-                "type": QWebChannelMessageTypes.invokeMethod,
+                "type": QWebChannelMessageTypes.disconnectFromSignal,
                 "object": self._id,
-                "method": methodIdx,
-                "args": args
-            }, responseCallback);
+                "signal": signal._signalIndex
+            })
+
+    def _invokeMethod(self, methodIdx, arguments, errback=None, timeout=None):
+        args = []
+        callback = None
+        for arg in arguments:
+            if callable(arg):
+                callback = arg
+            elif isinstance(arg, QObject) and arg._id in self._webChannel.objects:
+                args.append({ "id": arg._id })
+            else:
+                args.append(arg)
+
+        def responseCallback(response):
+            result = response
+            if self._webChannel._mayContainQObjects:
+                result = self._unwrapQObject(response)
+            if callback:
+                callback(result)
+
+        return self._webChannel.exec_({
+            "type": QWebChannelMessageTypes.invokeMethod,
+            "object": self._id,
+            "method": methodIdx,
+            "args": args
+        }, responseCallback, errback, timeout);
+
+    def _addMethod(self, methodData):
+        methodName = methodData[0];
+        methodIdx = methodData[1];
+
+        def method(self, *arguments, **options):
+            return self._invokeMethod(methodIdx, arguments, **options)
 
         method.isQtMethod = True
 
         setattr(self.__class__, methodName, method)
+        if '(' not in methodName or methodIdx not in self.__class__._methodNames:
+            self.__class__._methodNames[methodIdx] = methodName
 
     def _bindGetterSetter(self, propertyInfo):
         propertyIndex, propertyName, notifySignalData, propertyValue = propertyInfo
         propertyIndex = int(propertyIndex)
-
-        # initialize property cache with current value
-        # NOTE: if this is an object, it is not directly unwrapped as it might
-        # reference other QObject that we do not know yet
-        self._propertyCache[propertyIndex] = propertyValue
+        self.__class__._propertyKeys[propertyIndex] = propertyIndex
+        self.__class__._propertyKeys[str(propertyIndex)] = propertyIndex
+        self.__class__._propertyKeys[propertyName] = propertyIndex
+        self.__class__._propertyNames[propertyIndex] = propertyName
 
         if notifySignalData:
             if notifySignalData[0] == 1:
                 # signal name is optimized away, reconstruct the actual name
                 notifySignalData[0] = propertyName + "Changed";
             self._addSignal(notifySignalData, propertyName)
+            self.__class__._propertyNotifySignals[propertyIndex] = notifySignalData[1]
 
         def getter(self):
             return self._propertyCache[propertyIndex];
 
+        def lazyGetter(self):
+            value = self._propertyCache[propertyIndex]
+            if type(value) is _Unresolved:
+                value = self._resolveProperty(propertyIndex)
+            return value
+
         def setter(self, value):
-            if value is None:
-                print("Property setter for " + propertyName + " called with 'None' value!")
-                return
+            self._setProperty(propertyIndex, propertyName, value)
 
-            self._propertyCache[propertyIndex] = value;
+        if self._webChannel.lazy:
+            getter = lazyGetter
 
-            valueToSend = value
-            if isinstance(value, QObject) and value._id in self._webChannel.objects:
-                valueToSend = { "id": value._id }
+        setattr(self.__class__, propertyName, property(getter, setter, doc="Property"))
 
-            self._webChannel.exec_({
-                "type": QWebChannelMessageTypes.setProperty,
-                "object": self._id,
-                "property": propertyIndex,
-                "value": valueToSend
-            });
 
-        setattr(self.__class__, propertyName, property(getter, setter, doc="Property"))
+    def _resolveProperty(self, propertyIndex):
+        """Unwraps a property value which was left unresolved in lazy mode."""
+        value = self._propertyCache[propertyIndex] = self._unwrapQObject(
+            self._propertyCache[propertyIndex].value)
+        return value
 
+    def _setProperty(self, propertyIndex, propertyName, value):
+        if value is None:
+            print("Property setter for " + propertyName + " called with 'None' value!")
+            return
 
-class SignalDescriptor:
+        self._writableCache()[propertyIndex] = value
+        self._webChannel._recordChanges(self._id, (propertyIndex,))
+
+        valueToSend = value
+        if isinstance(value, QObject) and value._id in self._webChannel.objects:
+            valueToSend = { "id": value._id }
+
+        self._webChannel.exec_({
+            "type": QWebChannelMessageTypes.setProperty,
+            "object": self._id,
+            "property": propertyIndex,
+            "value": valueToSend
+        });
+
+
+class SignalDescriptor(object):
+
+    __slots__ = ('signalIndex', 'signalName', 'propertyName', '__doc__')
 
     def __init__(self, signalIndex, signalName, propertyName):
         self.signalIndex = signalIndex
@@ -336,13 +1229,10 @@ class SignalDescriptor:
             self.__doc__ = "Signal"
 
     def __get__(self, obj, type=None):
-        attrname = "_signal_" + self.signalName
-        try:
-            return getattr(obj, attrname)
-        except AttributeError:
-            signal = Signal(obj, self.signalIndex, self.signalName, self.propertyName is not None)
-            setattr(obj, attrname, signal)
-            return signal
+        if obj is None:
+            return self
+        # Signals only refer to the object, so they are cheap to create and not cached
+        return Signal(obj, self.signalIndex, self.signalName, self.propertyName is not None)
 
     def __set__(self, obj, value):
         raise AttributeError()
@@ -350,51 +1240,172 @@ class SignalDescriptor:
 
 class Signal(object):
 
+    __slots__ = ('_qObject', '_signalIndex', '_signalName', 'isPropertyNotifySignal')
+
     def __init__(self, qObject, signalIndex, signalName, isPropertyNotifySignal):
         self._qObject = qObject
         self._signalIndex = signalIndex
         self._signalName = signalName
         self.isPropertyNotifySignal = isPropertyNotifySignal
 
-    def connect(self, callback):
+    def connect(self, callback, max_rate=None, latest_only=False,
+                executor=None, mode=None, queue_size=None, overflow="drop"):
+        """Connects callback to this signal.
+
+        If max_rate is given, callback is invoked at most max_rate times per second.
+        With max_rate or latest_only, emissions are coalesced so that only the most
+        recent arguments are delivered. Property values are updated regardless.
+
+        By default, callback is invoked while the message is dispatched. If an
+        executor (e.g. a concurrent.futures.ThreadPoolExecutor) is given, it runs
+        there instead; with mode="task", it runs in an asyncio task and may be a
+        coroutine function. Either way, emissions are delivered one at a time and
+        in order. If queue_size emissions are waiting, further ones are dropped,
+        or with overflow="coalesce" replace the waiting ones."""
         if not callable(callback):
             print("Bad callback given to connect to signal " + self._signalName)
             return
 
-        if self._signalIndex not in self._qObject._objectSignals:
-            self._qObject._objectSignals[self._signalIndex] = []
-        self._qObject._objectSignals[self._signalIndex].append(callback);
+        if executor is not None or mode == "task":
+            callback = _QueuedCallback(callback, self._qObject._webChannel, executor,
+                                       queue_size, overflow)
+        elif mode not in (None, "inline"):
+            raise ValueError("Invalid mode for signal connection: " + str(mode))
 
-        if not self.isPropertyNotifySignal and self._signalName != "destroyed":
-            # only required for "pure" signals, handled separately for properties in _propertyUpdate
-            # also note that we always get notified about the destroyed signal
-            self._qObject._webChannel.exec_({
-                "type": QWebChannelMessageTypes.connectToSignal,
-                "object": self._qObject._id,
-                "signal": self._signalIndex
-            })
+        if max_rate or latest_only:
+            callback = _CoalescingCallback(callback, self._qObject._webChannel, max_rate)
+
+        self._qObject._connectSignal(self, callback)
 
     def disconnect(self, callback):
         if not callable(callback):
             print("Bad callback given to disconnect from signal " + self._signalName)
             return
 
-        if self._signalIndex not in self._qObject._objectSignals:
-            self._qObject._objectSignals[self._signalIndex] = []
+        self._qObject._disconnectSignal(self, callback)
+
 
-        if callback not in self._qObject._objectSignals[self._signalIndex]:
-            print("Cannot find connection of signal " + self._signalName + " to " + str(callback))
+class _CoalescingCallback(object):
+    '''Wraps a signal callback so that only the most recent emission is delivered,
+    at most maxRate times per second, or once per event loop iteration if maxRate is None.'''
+
+    __slots__ = ('callback', '_webChannel', '_interval', '_args', '_timer', '_lastDelivery')
+
+    def __init__(self, callback, webChannel, maxRate):
+        self.callback = callback
+        self._webChannel = webChannel
+        self._interval = 1.0 / maxRate if maxRate else 0.0
+        self._args = None
+        self._timer = None
+        self._lastDelivery = None
+
+    def __call__(self, *args):
+        self._args = args
+        if self._timer is not None:
+            # delivery is already scheduled and will use the latest arguments
             return
 
-        self._qObject._objectSignals[self._signalIndex].remove(callback)
+        delay = 0.0
+        if self._interval:
+            now = time.monotonic()
+            if self._lastDelivery is None or now - self._lastDelivery >= self._interval:
+                self._deliver()
+                return
+            delay = self._lastDelivery + self._interval - now
 
-        if not self.isPropertyNotifySignal and len(self._qObject._objectSignals[self._signalIndex]) == 0:
-            # only required for "pure" signals, handled separately for properties in _propertyUpdate
-            self._qObject._webChannel.exec_({
-                "type": QWebChannelMessageTypes.disconnectFromSignal,
-                "object": self._qObject._id,
-                "signal": self._signalIndex
-            })
+        self._timer = self._webChannel._callLater(delay, self._deliver)
+
+    def _deliver(self):
+        self._timer = None
+        args, self._args = self._args, None
+        self._lastDelivery = time.monotonic()
+        self.callback(*args)
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+class _QueuedCallback(object):
+    '''Wraps a signal callback so that it runs in an executor or an asyncio task.
+
+    Emissions are queued and processed one at a time, so their order is kept.'''
+
+    __slots__ = ('callback', '_webChannel', '_executor', '_maxsize', '_coalesce',
+                 '_queue', '_running', '_lock', 'dropped')
+
+    def __init__(self, callback, webChannel, executor, maxsize, overflow):
+        if overflow not in ("drop", "coalesce"):
+            raise ValueError("Invalid overflow policy: " + str(overflow))
+        if executor is None and getattr(webChannel, '_loop', None) is None:
+            raise ValueError("Running signal callbacks as tasks requires an asyncio QWebChannel")
+
+        self.callback = callback
+        self._webChannel = webChannel
+        self._executor = executor
+        self._maxsize = maxsize
+        self._coalesce = overflow == "coalesce"
+        self._queue = collections.deque()
+        self._running = False
+        self._lock = threading.Lock()
+        # Number of emissions dropped due to a full queue
+        self.dropped = 0
+
+    def __call__(self, *args):
+        with self._lock:
+            if self._maxsize and len(self._queue) >= self._maxsize:
+                self.dropped += 1
+                if not self._coalesce:
+                    return
+                self._queue.clear()
+            self._queue.append(args)
+            if self._running:
+                return
+            self._running = True
+
+        if self._executor is not None:
+            self._executor.submit(self._run)
+        else:
+            self._webChannel._loop.create_task(self._runAsync())
+
+    def _next(self):
+        with self._lock:
+            if not self._queue:
+                self._running = False
+                return None
+            return self._queue.popleft()
+
+    def _run(self):
+        args = self._next()
+        while args is not None:
+            try:
+                self.callback(*args)
+            except Exception:
+                traceback.print_exc()
+            args = self._next()
+
+    async def _runAsync(self):
+        args = self._next()
+        while args is not None:
+            try:
+                result = self.callback(*args)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                traceback.print_exc()
+            args = self._next()
+
+    def cancel(self):
+        with self._lock:
+            self._queue.clear()
+
+
+def _unwrapCallback(callback):
+    """Returns the callback passed to Signal.connect() for a connected callback."""
+    while isinstance(callback, (_CoalescingCallback, _QueuedCallback)):
+        callback = callback.callback
+    return callback
 
 
 QWebChannel.QObjectType = QObject
@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+'''A pure-Python QWebChannel server, publishing Python objects to QWebChannel clients.
+
+Public methods of a published object are exposed as methods. Signals and
+properties are declared on its class with Signal and Property:
+
+    class Counter(object):
+        overflow = Signal()
+        value = Property(0)  # notify signal valueChanged is added automatically
+
+        def increment(self, step):
+            self.value += step
+            if self.value > 100:
+                self.overflow.emit(self.value)
+
+    server = QWebChannelServer()
+    server.registerObject("counter", Counter())
+    await server.serve("localhost", 12345)
+
+Plain Python properties are published as properties without notify signal and
+enum.IntEnum classes defined on the class as enums. Any other object returned
+from a method or stored in a property is published as a QObject on the fly.'''
+
+from .codec import defaultCodec
+from .framing import LineFramer, LengthPrefixFramer, FrameTooLargeError
+from .qwebchannel import QWebChannelMessageTypes
+from .transports import loopbackPair
+import asyncio
+import enum
+import inspect
+import uuid
+
+
+class Signal(object):
+    '''Declares a signal on a class. Emit it with obj.signal.emit(*args).'''
+
+    def __init__(self):
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def listeners(self, obj):
+        """Returns the list of callbacks connected to this signal of obj."""
+        return obj.__dict__.setdefault('_signalListeners', {}).setdefault(self.name, [])
+
+    def __get__(self, obj, type=None):
+        if obj is None:
+            return self
+        return BoundSignal(obj, self)
+
+
+class BoundSignal(object):
+    '''A Signal of an object.'''
+
+    __slots__ = ('_obj', '_signal')
+
+    def __init__(self, obj, signal):
+        self._obj = obj
+        self._signal = signal
+
+    def connect(self, callback):
+        self._signal.listeners(self._obj).append(callback)
+
+    def disconnect(self, callback):
+        self._signal.listeners(self._obj).remove(callback)
+
+    def emit(self, *args):
+        for callback in list(self._signal.listeners(self._obj)):
+            callback(*args)
+
+
+class Property(object):
+    '''Declares a property on a class, stored in the instance.
+
+    If notify is True, a notify signal called <name>Changed is added to the class.
+    Pass a Signal to use that instead, or None for a property without notify signal.
+    Setting the property to a different value emits the notify signal with the new value.'''
+
+    def __init__(self, default=None, notify=True, readonly=False):
+        self.default = default
+        self.notify = notify
+        self.readonly = readonly
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        if self.notify is True:
+            self.notify = Signal()
+            self.notify.__set_name__(owner, name + "Changed")
+            setattr(owner, name + "Changed", self.notify)
+
+    def __get__(self, obj, type=None):
+        if obj is None:
+            return self
+        return obj.__dict__.get(self.name, self.default)
+
+    def __set__(self, obj, value):
+        if value == self.__get__(obj):
+            return
+        obj.__dict__[self.name] = value
+        if self.notify:
+            self.notify.__get__(obj).emit(value)
+
+
+class _ClassInfo(object):
+    '''Introspected interface of a published class.'''
+
+    def __init__(self, cls):
+        # Signals and methods share one index space, as in Qt. Index 0 is the
+        # destroyed signal, which clients always receive.
+        self.signals = [("destroyed", 0)]
+        self.methods = []
+        self.properties = []  # (index, name, notify signal index or None)
+        self.enums = {}
+
+        signals = {}
+        members = [(name, inspect.getattr_static(cls, name)) for name in dir(cls)
+                   if not name.startswith('_')]
+
+        for name, member in members:
+            if isinstance(member, Signal):
+                signals[name] = len(signals) + 1
+
+        for name, member in members:
+            if isinstance(member, Property):
+                notify = signals[member.notify.name] if member.notify else None
+                self.properties.append((len(self.properties), name, notify))
+            elif isinstance(member, property):
+                self.properties.append((len(self.properties), name, None))
+            elif inspect.isclass(member) and issubclass(member, enum.Enum):
+                self.enums[name] = {m.name: m.value for m in member}
+
+        notifySignals = set(prop[2] for prop in self.properties)
+        for name, index in signals.items():
+            if index not in notifySignals:
+                self.signals.append((name, index))
+
+        index = len(signals) + 1
+        for name, member in members:
+            if isinstance(member, (staticmethod, classmethod)) or inspect.isfunction(member):
+                self.methods.append((name, index))
+                index += 1
+
+        self.signalNames = dict((index, name) for name, index in signals.items())
+        self.signalNames[0] = "destroyed"
+        self.methodNames = dict((index, name) for name, index in self.methods)
+        self.propertyNames = dict((index, name) for index, name, notify in self.properties)
+        self.propertiesByNotify = dict((notify, index) for index, name, notify in self.properties
+                                       if notify is not None)
+
+    def describe(self, obj, wrap):
+        """Returns the descriptor of obj for the init message or a wrapped QObject."""
+        properties = []
+        for index, name, notify in self.properties:
+            if notify is None:
+                notifyInfo = []
+            elif self.signalNames[notify] == name + "Changed":
+                # the signal name is optimized away, as done by Qt
+                notifyInfo = [1, notify]
+            else:
+                notifyInfo = [self.signalNames[notify], notify]
+            properties.append([index, name, notifyInfo, wrap(getattr(obj, name))])
+
+        return {
+            "methods": [list(method) for method in self.methods],
+            "properties": properties,
+            "signals": [list(signal) for signal in self.signals],
+            "enums": self.enums,
+        }
+
+
+class Session(object):
+    '''State of one client of a QWebChannelServer.
+
+    send is called with each message dict to be sent to the client.'''
+
+    def __init__(self, send):
+        self.send = send
+        # The client is idle when it has processed the last property update
+        self.idle = False
+        self.flushScheduled = False
+        # (object id, signal index) pairs the client has connected to
+        self.subscriptions = set()
+        # Ids of the objects whose descriptors have been sent to the client
+        self.knownObjects = set()
+        # object id -> (signals, properties) of pending property updates
+        self.pendingUpdates = {}
+
+
+class _BaseServer(object):
+    '''Common part of the servers, managing client sessions and their transports.
+
+    Subclasses map message types to handler(session, message) in self._handlers.'''
+
+    def __init__(self, loop=None):
+        self._loop = loop
+        self.sessions = []
+        self._handlers = {}
+
+    def connect(self, send):
+        """Adds a client, to which messages are sent by calling send with a message dict.
+
+        Returns the Session to pass to messageReceived() and disconnect()."""
+        session = Session(send)
+        self.sessions.append(session)
+        return session
+
+    def disconnect(self, session):
+        """Removes a client."""
+        self.sessions.remove(session)
+
+    def messageReceived(self, session, message):
+        """Handles a decoded message from the client of session."""
+        handler = self._handlers.get(message.get("type"))
+        if handler is None:
+            print("invalid message received: ", message)
+            return
+        handler(session, message)
+
+    async def serve(self, host=None, port=None, **kwargs):
+        """Serves clients over TCP, with newline-delimited messages. Returns the asyncio Server."""
+        loop = self._loop or asyncio.get_event_loop()
+        return await loop.create_server(lambda: QWebChannelServerProtocol(self, **kwargs), host, port)
+
+    async def serveUnix(self, path, **kwargs):
+        """Serves clients over a Unix domain socket. Returns the asyncio Server.
+
+        Pass lengthPrefixed=True for clients using transports.UnixSocketTransport."""
+        loop = self._loop or asyncio.get_event_loop()
+        return await loop.create_unix_server(lambda: QWebChannelServerProtocol(self, **kwargs), path)
+
+    def connectChannel(self, webChannel):
+        """Connects the client webChannel to this server in memory, without a network.
+
+        Messages go through the channel's codec, so the client behaves as with a real
+        transport. They are delivered in the next loop iteration if the server has a loop,
+        else right away."""
+        serverEnd, clientEnd = loopbackPair(self._loop)
+        _InMemoryConnection(self, serverEnd, webChannel.codec)
+        clientEnd.connectChannel(webChannel)
+        return clientEnd
+
+
+class QWebChannelServer(_BaseServer):
+    '''Publishes Python objects over the QWebChannel protocol.
+
+    Property updates are collected and sent to a client once it has processed
+    the previous update, after propertyUpdateInterval seconds. Without a loop,
+    they are sent right away and methods may not return awaitables.'''
+
+    def __init__(self, loop=None, propertyUpdateInterval=0):
+        super().__init__(loop)
+        self.propertyUpdateInterval = propertyUpdateInterval
+
+        # object id -> object, for all published objects
+        self._objects = {}
+        # id(object) -> object id
+        self._objectIds = {}
+        # object id -> list of (BoundSignal, callback) connected by the server
+        self._connections = {}
+        # names of the objects registered with registerObject()
+        self._registeredNames = []
+        self._classInfos = {}
+
+        self._handlers = {
+            QWebChannelMessageTypes.init: self._handleInit,
+            QWebChannelMessageTypes.idle: self._handleIdle,
+            QWebChannelMessageTypes.debug: self._handleDebug,
+            QWebChannelMessageTypes.invokeMethod: self._handleInvokeMethod,
+            QWebChannelMessageTypes.connectToSignal: self._handleConnectToSignal,
+            QWebChannelMessageTypes.disconnectFromSignal: self._handleDisconnectFromSignal,
+            QWebChannelMessageTypes.setProperty: self._handleSetProperty,
+        }
+
+    def _classInfo(self, obj):
+        cls = type(obj)
+        info = self._classInfos.get(cls)
+        if info is None:
+            info = self._classInfos[cls] = _ClassInfo(cls)
+        return info
+
+    def registerObject(self, name, obj):
+        """Publishes obj under name. Clients connecting afterwards receive it in their init message."""
+        if name in self._objects:
+            raise KeyError("An object called {} is already registered".format(name))
+        self._addObject(name, obj)
+        self._registeredNames.append(name)
+
+    def deregisterObject(self, obj):
+        """Stops publishing obj and notifies clients with its destroyed signal."""
+        objectId = self._objectIds.pop(id(obj))
+        del self._objects[objectId]
+        if objectId in self._registeredNames:
+            self._registeredNames.remove(objectId)
+        for boundSignal, callback in self._connections.pop(objectId):
+            boundSignal.disconnect(callback)
+
+        for session in self.sessions:
+            session.pendingUpdates.pop(objectId, None)
+            session.subscriptions = set(s for s in session.subscriptions if s[0] != objectId)
+            if objectId in session.knownObjects:
+                session.knownObjects.discard(objectId)
+                session.send({"type": QWebChannelMessageTypes.signal,
+                              "object": objectId, "signal": 0, "args": []})
+
+    def _addObject(self, objectId, obj):
+        self._objects[objectId] = obj
+        self._objectIds[id(obj)] = objectId
+
+        info = self._classInfo(obj)
+        connections = self._connections[objectId] = []
+        for signalIndex, signalName in info.signalNames.items():
+            if signalIndex == 0:
+                continue
+            boundSignal = getattr(obj, signalName)
+
+            propertyIndex = info.propertiesByNotify.get(signalIndex)
+            if propertyIndex is not None:
+                def callback(*args, signalIndex=signalIndex, propertyIndex=propertyIndex):
+                    self._propertyChanged(objectId, signalIndex, args, propertyIndex)
+            else:
+                def callback(*args, signalIndex=signalIndex):
+                    self._signalEmitted(objectId, signalIndex, args)
+
+            boundSignal.connect(callback)
+            connections.append((boundSignal, callback))
+
+    def _signalEmitted(self, objectId, signalIndex, args):
+        for session in self.sessions:
+            if (objectId, signalIndex) in session.subscriptions:
+                session.send({
+                    "type": QWebChannelMessageTypes.signal,
+                    "object": objectId,
+                    "signal": signalIndex,
+                    "args": self._wrap(session, list(args)),
+                })
+
+    def _propertyChanged(self, objectId, signalIndex, args, propertyIndex):
+        for session in self.sessions:
+            if objectId not in session.knownObjects:
+                continue
+            signals, properties = session.pendingUpdates.setdefault(objectId, ({}, {}))
+            signals[signalIndex] = args
+            properties[propertyIndex] = True
+            self._scheduleFlush(session)
+
+    def _scheduleFlush(self, session):
+        if not session.idle or session.flushScheduled:
+            return
+        if self._loop is None:
+            self._flush(session)
+        else:
+            session.flushScheduled = True
+            self._loop.call_later(self.propertyUpdateInterval, self._flush, session)
+
+    def _flush(self, session):
+        session.flushScheduled = False
+        if not session.idle or not session.pendingUpdates or session not in self.sessions:
+            return
+
+        pending, session.pendingUpdates = session.pendingUpdates, {}
+        data = []
+        for objectId, (signals, properties) in pending.items():
+            obj = self._objects.get(objectId)
+            if obj is None:
+                continue
+            propertyNames = self._classInfo(obj).propertyNames
+            # clients unwrap the properties first, so objects new to the client
+            # must be described there rather than in the signal arguments
+            wrappedProperties = dict((str(index), self._wrap(session, getattr(obj, propertyNames[index])))
+                                     for index in properties)
+            data.append({
+                "object": objectId,
+                "signals": dict((str(index), self._wrap(session, list(args)))
+                                for index, args in signals.items()),
+                "properties": wrappedProperties,
+            })
+
+        session.idle = False
+        session.send({"type": QWebChannelMessageTypes.propertyUpdate, "data": data})
+
+    def _wrap(self, session, value):
+        """Converts value for sending to session, publishing objects as QObjects."""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [self._wrap(session, v) for v in value]
+        if isinstance(value, dict):
+            return dict((k, self._wrap(session, v)) for k, v in value.items())
+
+        objectId = self._objectIds.get(id(value))
+        if objectId is None:
+            objectId = str(uuid.uuid4())
+            self._addObject(objectId, value)
+
+        wrapped = {"__QObject*__": True, "id": objectId}
+        if objectId not in session.knownObjects:
+            session.knownObjects.add(objectId)
+            wrapped["data"] = self._classInfo(value).describe(value, lambda v: self._wrap(session, v))
+        return wrapped
+
+    def _unwrap(self, value):
+        """Converts a value received from a client, resolving object references."""
+        if isinstance(value, list):
+            return [self._unwrap(v) for v in value]
+        if isinstance(value, dict):
+            if len(value) == 1 and value.get("id") in self._objects:
+                return self._objects[value["id"]]
+            return dict((k, self._unwrap(v)) for k, v in value.items())
+        return value
+
+    def _respond(self, session, message, result):
+        if "id" in message:
+            session.send({
+                "type": QWebChannelMessageTypes.response,
+                "id": message["id"],
+                "data": self._wrap(session, result),
+            })
+
+    def _handleInit(self, session, message):
+        session.pendingUpdates.clear()
+        data = {}
+        for name in self._registeredNames:
+            obj = self._objects[name]
+            session.knownObjects.add(name)
+            data[name] = self._classInfo(obj).describe(obj, lambda v: self._wrap(session, v))
+        session.send({"type": QWebChannelMessageTypes.response, "id": message["id"], "data": data})
+
+    def _handleIdle(self, session, message):
+        session.idle = True
+        if session.pendingUpdates:
+            self._scheduleFlush(session)
+
+    def _handleDebug(self, session, message):
+        print("Debug message from client: " + str(message.get("data")))
+
+    def _lookup(self, message, what, names):
+        obj = self._objects.get(message.get("object"))
+        if obj is None:
+            print("Cannot find object " + str(message.get("object")))
+            return None, None
+        name = getattr(self._classInfo(obj), names).get(message.get(what))
+        if name is None:
+            print("Cannot find {} {} of object {}".format(what, message.get(what), message["object"]))
+            return None, None
+        return obj, name
+
+    def _handleInvokeMethod(self, session, message):
+        obj, name = self._lookup(message, "method", "methodNames")
+        if obj is None:
+            self._respond(session, message, None)
+            return
+
+        args = [self._unwrap(arg) for arg in message.get("args", [])]
+        try:
+            result = getattr(obj, name)(*args)
+        except Exception as e:
+            print("Error invoking method {}: {!r}".format(name, e))
+            result = None
+
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result, loop=self._loop)
+
+            def done(task):
+                if task.cancelled() or task.exception() is not None:
+                    print("Error invoking method {}: {!r}".format(
+                        name, None if task.cancelled() else task.exception()))
+                    self._respond(session, message, None)
+                elif session in self.sessions:
+                    self._respond(session, message, task.result())
+
+            task.add_done_callback(done)
+        else:
+            self._respond(session, message, result)
+
+    def _handleSetProperty(self, session, message):
+        obj, name = self._lookup(message, "property", "propertyNames")
+        if obj is not None:
+            member = inspect.getattr_static(type(obj), name)
+            if isinstance(member, Property) and member.readonly:
+                print("Cannot set read-only property " + name)
+                return
+            try:
+                setattr(obj, name, self._unwrap(message.get("value")))
+            except AttributeError as e:
+                print("Cannot set property {}: {}".format(name, e))
+
+    def _handleConnectToSignal(self, session, message):
+        obj, name = self._lookup(message, "signal", "signalNames")
+        if obj is not None:
+            session.subscriptions.add((message["object"], message["signal"]))
+
+    def _handleDisconnectFromSignal(self, session, message):
+        session.subscriptions.discard((message.get("object"), message.get("signal")))
+
+
+class _InMemoryConnection(object):
+    '''Server end of an in-memory connection to a client QWebChannel.'''
+
+    def __init__(self, server, transport, codec):
+        self._server = server
+        self._transport = transport
+        self._codec = codec
+        self._session = server.connect(self._send)
+        transport.onReceive = self._receive
+        transport.onClose = self._close
+
+    def _send(self, message):
+        self._transport.send(self._codec.encode(message))
+
+    def _receive(self, data):
+        self._server.messageReceived(self._session, self._codec.decode(data))
+
+    def _close(self):
+        if self._session in self._server.sessions:
+            self._server.disconnect(self._session)
+
+
+class QWebChannelServerProtocol(asyncio.Protocol):
+    '''asyncio.Protocol connecting a client on a streaming transport to a QWebChannelServer.
+
+    Messages are newline-delimited, or length-prefixed if the codec is binary
+    or lengthPrefixed is set, e.g. for clients using transports.UnixSocketTransport.'''
+
+    def __init__(self, server, codec=None, maxFrameSize=None, lengthPrefixed=False):
+        self.server = server
+        self.codec = codec if codec is not None else defaultCodec()
+        framerType = LengthPrefixFramer if self.codec.binary or lengthPrefixed else LineFramer
+        self._framer = framerType(maxFrameSize)
+        self.session = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.session = self.server.connect(self.send)
+
+    def connection_lost(self, exc):
+        self.server.disconnect(self.session)
+
+    def _frame_received(self, frame):
+        self.server.messageReceived(self.session, self.codec.decode(frame))
+
+    def data_received(self, data):
+        try:
+            self._framer.feed(data, self._frame_received)
+        except FrameTooLargeError as e:
+            print("Closing connection: " + str(e))
+            self.transport.close()
+
+    def send(self, message):
+        self.transport.writelines(self._framer.pack(self.codec.encode(message)))
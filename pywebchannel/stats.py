@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+'''Latency and throughput statistics of a QWebChannel.
+
+Enable them with QWebChannel(instrument=True) or QWebChannel.enableStats(). The
+collected data is available through ChannelStats.snapshot(). Exporters can also
+register a listener, which is called with every observation:
+
+    def export(metric, labels, value):
+        statsd.timing(metric, value, tags=labels)
+
+    channel.enableStats().addListener(export)
+
+Metrics reported to listeners are call_latency_seconds (labels object, method),
+signal_callback_seconds (object, signal), messages_sent and messages_received
+(type, value is the size in bytes or None if unknown) and calls_dropped (object,
+method, reason: timeout, cancelled or failed).'''
+
+from .qwebchannel import QWebChannelMessageTypes
+import bisect
+import time
+
+
+class Histogram(object):
+    '''Histogram of durations in seconds with logarithmic buckets.'''
+
+    __slots__ = ('count', 'sum', 'min', 'max', 'buckets')
+
+    # upper bounds of the buckets, from 10 µs to 10 s; the last bucket is unbounded
+    bounds = tuple(m * 10.0 ** e for e in range(-5, 1) for m in (1, 2.5, 5)) + (10.0,)
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(self.bounds) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "buckets": [[bound, count] for bound, count
+                        in zip(self.bounds + (float("inf"),), self.buckets)],
+        }
+
+
+class _MessageCounter(object):
+    __slots__ = ('count', 'bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+
+
+def _key(objectId, name):
+    return objectId + "." + name if objectId else name
+
+
+def _typeName(message):
+    try:
+        return QWebChannelMessageTypes(message["type"]).name
+    except (KeyError, TypeError, ValueError):
+        return "unknown"
+
+
+class ChannelStats(object):
+    '''Statistics collected by a QWebChannel.'''
+
+    def __init__(self, webChannel):
+        self._webChannel = webChannel
+        self._listeners = []
+        # exec id -> (start time, message) of pending calls
+        self._callStarts = {}
+        self.reset()
+
+    def reset(self):
+        """Discards all collected data, except for currently pending calls."""
+        self.callLatency = {}
+        self.signalCallbacks = {}
+        self.sent = {}
+        self.received = {}
+        self.dropped = {}
+
+    def addListener(self, callback):
+        """Registers callback(metric, labels, value), invoked for each observation."""
+        self._listeners.append(callback)
+
+    def removeListener(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, metric, labels, value):
+        for callback in self._listeners:
+            callback(metric, labels, value)
+
+    def _callLabels(self, message):
+        if message.get("type") != QWebChannelMessageTypes.invokeMethod:
+            return ("", _typeName(message))
+
+        objectId = message.get("object")
+        qObject = self._webChannel._loadedObject(objectId)
+        methodIdx = message.get("method")
+        methodName = getattr(qObject, '_methodNames', {}).get(methodIdx, str(methodIdx))
+        return (objectId, methodName)
+
+    def callStarted(self, execId, message):
+        self._callStarts[execId] = (time.perf_counter(), message)
+
+    def callFinished(self, execId):
+        entry = self._callStarts.pop(execId, None)
+        if entry is None:
+            return
+        start, message = entry
+        elapsed = time.perf_counter() - start
+
+        labels = self._callLabels(message)
+        histogram = self.callLatency.get(labels)
+        if histogram is None:
+            histogram = self.callLatency[labels] = Histogram()
+        histogram.add(elapsed)
+        if self._listeners:
+            self._notify("call_latency_seconds", {"object": labels[0], "method": labels[1]}, elapsed)
+
+    def callDropped(self, execId, reason):
+        entry = self._callStarts.pop(execId, None)
+        if entry is None:
+            return
+        labels = self._callLabels(entry[1]) + (reason,)
+        self.dropped[labels] = self.dropped.get(labels, 0) + 1
+        if self._listeners:
+            self._notify("calls_dropped",
+                         {"object": labels[0], "method": labels[1], "reason": reason}, 1)
+
+    def _countMessage(self, counters, metric, message, size):
+        typeName = _typeName(message) if isinstance(message, dict) else "unknown"
+        counter = counters.get(typeName)
+        if counter is None:
+            counter = counters[typeName] = _MessageCounter()
+        counter.count += 1
+        if size is not None:
+            counter.bytes += size
+        if self._listeners:
+            self._notify(metric, {"type": typeName}, size)
+
+    def messageSent(self, message, size):
+        self._countMessage(self.sent, "messages_sent", message, size)
+
+    def messageReceived(self, message, size):
+        self._countMessage(self.received, "messages_received", message, size)
+
+    def signalCallback(self, qObject, signalIndex, elapsed):
+        signalName = getattr(qObject, '_signalNames', {}).get(signalIndex, str(signalIndex))
+        labels = (qObject._id, signalName)
+        histogram = self.signalCallbacks.get(labels)
+        if histogram is None:
+            histogram = self.signalCallbacks[labels] = Histogram()
+        histogram.add(elapsed)
+        if self._listeners:
+            self._notify("signal_callback_seconds", {"object": labels[0], "signal": labels[1]}, elapsed)
+
+    def snapshot(self):
+        """Returns all statistics as a dict of plain values, e.g. for JSON export."""
+        webChannel = self._webChannel
+        return {
+            "calls": {
+                "pending": len(webChannel.execCallbacks),
+                "inFlight": webChannel._inFlight,
+                "queued": len(webChannel._execBacklog),
+            },
+            "callLatency": dict((_key(*labels), h.snapshot())
+                                for labels, h in self.callLatency.items()),
+            "callsDropped": dict((_key(objectId, method) + ":" + reason, count)
+                                 for (objectId, method, reason), count in self.dropped.items()),
+            "signalCallbacks": dict((_key(*labels), h.snapshot())
+                                    for labels, h in self.signalCallbacks.items()),
+            "sent": dict((name, {"count": c.count, "bytes": c.bytes}) for name, c in self.sent.items()),
+            "received": dict((name, {"count": c.count, "bytes": c.bytes})
+                             for name, c in self.received.items()),
+        }
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+'''Incremental decoding of large messages.
+
+Normally a message is decoded once it has been received completely, so a large
+init message is held as raw data, decoded tree and QObjects at the same time.
+With QWebChannelProtocol(streaming=True), a message which has not ended after
+StreamingFramer.threshold bytes is decoded while it is being received instead:
+the raw data is dropped as soon as it is decoded, and the members of its "data"
+are handled one at a time. Each object descriptor of the init response becomes
+a QObject and each entry of a propertyUpdate is applied right away.
+
+Qt sends the keys of a message sorted, so "data" arrives before "type" and
+"id". Its members are therefore handled right away only if the message cannot
+be anything else: a dict of descriptors while the first init response is the
+only response the channel waits for, or a list of property update entries while
+no call awaits a response. Otherwise they are collected and the message is
+handled as usual once complete. Only newline-delimited JSON messages can be
+decoded this way.'''
+
+from .framing import LineFramer
+from .qwebchannel import QWebChannelMessageTypes, _QOBJECT_MARKER
+import codecs
+import json
+
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\r\n'
+_entryKeys = frozenset(("object", "signals", "properties"))
+
+# returned by _StreamedMessage._decode() if the value has not been received completely
+_INCOMPLETE = object()
+
+
+def _awaitsInit(webChannel):
+    """Returns whether the next response can only be the init response of a new channel."""
+    # any other pending call might be answered with a dict, too
+    return (not webChannel.isInitialized() and not webChannel._reconnected
+            and len(webChannel.execCallbacks) == 1 and webChannel._initId in webChannel.execCallbacks)
+
+
+class _StreamedMessage(object):
+    '''Decoder of one message received in pieces.'''
+
+    def __init__(self, webChannel):
+        self._webChannel = webChannel
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._text = ''
+        self._pos = 0
+        # text received since the last parse attempt
+        self._chunks = []
+        self._pendingSize = 0
+        # size of the unparsed text needed to try again after an incomplete value
+        self._retryAt = 0
+        self._final = False
+        self._failed = False
+        self.size = 0
+
+        self._state = self._start
+        self._key = None
+        self.fields = {}
+        # handler of the members of "data", and the members collected if there is none
+        self._handleItem = None
+        self._data = None
+        self._dataIsDict = False
+        self._mayContainQObjects = False
+
+    def feed(self, data):
+        """Decodes data, up to the end of the message. Returns the bytes following it, or None."""
+        end = data.find(b'\n')
+        rest = None
+        if end >= 0:
+            rest = data[end + 1:]
+            data = data[:end]
+        self.size += len(data)
+        if self._failed:
+            return rest
+
+        text = self._utf8.decode(data, final=rest is not None)
+        self._chunks.append(text)
+        self._pendingSize += len(text)
+        self._final = rest is not None
+        if not self._final and len(self._text) - self._pos + self._pendingSize < self._retryAt:
+            return None
+
+        self._text = self._text[self._pos:] + ''.join(self._chunks)
+        self._pos = 0
+        self._chunks = []
+        self._pendingSize = 0
+        try:
+            while self._state():
+                pass
+            if self._final:
+                if self._state != self._end:
+                    raise ValueError("Message ends prematurely")
+                self._finish()
+        except ValueError as e:
+            self._failed = True
+            print("invalid message received: " + str(e))
+        return rest
+
+    def _skip(self):
+        """Skips whitespace. Returns False if the text ends."""
+        text, pos = self._text, self._pos
+        while pos < len(text) and text[pos] in _whitespace:
+            pos += 1
+        self._pos = pos
+        return pos < len(text)
+
+    def _decode(self):
+        """Decodes the JSON value at the current position, or returns _INCOMPLETE."""
+        text, pos = self._text, self._pos
+        try:
+            value, end = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            if self._final:
+                raise
+            end = len(text)
+        # a number at the end of the text might continue
+        if end == len(text) and not self._final:
+            self._retryAt = 2 * (end - pos)
+            return _INCOMPLETE
+        if text.find(_QOBJECT_MARKER, pos, end) >= 0:
+            self._mayContainQObjects = True
+        self._pos = end
+        self._retryAt = 0
+        return value
+
+    def _expect(self, char):
+        if self._text[self._pos] != char:
+            raise ValueError("Expected {!r} at {!r}".format(char, self._text[self._pos:self._pos + 20]))
+        self._pos += 1
+
+    def _start(self):
+        if not self._skip():
+            return False
+        self._expect('{')
+        self._state = self._nextKey
+        return True
+
+    def _nextKey(self):
+        if not self._skip():
+            return False
+        char = self._text[self._pos]
+        if char == '}':
+            self._pos += 1
+            self._state = self._end
+            return True
+        if char == ',':
+            self._pos += 1
+            return True
+        key = self._decode()
+        if key is _INCOMPLETE:
+            return False
+        self._key = key
+        self._state = self._colon
+        return True
+
+    def _colon(self):
+        if not self._skip():
+            return False
+        self._expect(':')
+        self._state = self._value
+        return True
+
+    def _value(self):
+        if not self._skip():
+            return False
+        char = self._text[self._pos]
+        if self._key == "data" and char in '{[':
+            self._pos += 1
+            self._beginData(char == '{')
+            self._state = self._nextItem
+            return True
+        value = self._decode()
+        if value is _INCOMPLETE:
+            return False
+        self.fields[self._key] = value
+        self._state = self._nextKey
+        return True
+
+    def _end(self):
+        # only whitespace may follow the message
+        if self._skip():
+            raise ValueError("Unexpected data after message")
+        return False
+
+    def _beginData(self, isDict):
+        fields = self.fields
+        webChannel = self._webChannel
+        self._dataIsDict = isDict
+        messageType = fields.get("type")
+        if (isDict and _awaitsInit(webChannel)
+                and messageType in (None, QWebChannelMessageTypes.response)
+                and fields.get("id", webChannel._initId) == webChannel._initId):
+            self._handleItem = self._addObject
+        elif not isDict and messageType == QWebChannelMessageTypes.propertyUpdate:
+            self._handleItem = self._updateObject
+        elif not isDict and messageType is None and not webChannel.execCallbacks:
+            self._handleItem = self._guessUpdate
+        else:
+            self._data = {} if isDict else []
+
+    def _nextItem(self):
+        if not self._skip():
+            return False
+        char = self._text[self._pos]
+        if char == ('}' if self._dataIsDict else ']'):
+            self._pos += 1
+            self._state = self._nextKey
+            return True
+        if char == ',':
+            self._pos += 1
+            return True
+        if self._dataIsDict:
+            key = self._decode()
+            if key is _INCOMPLETE:
+                return False
+            self._key = key
+            self._state = self._itemColon
+            return True
+        return self._itemValue()
+
+    def _itemColon(self):
+        if not self._skip():
+            return False
+        self._expect(':')
+        self._state = self._itemValue
+        return True
+
+    def _itemValue(self):
+        if not self._skip():
+            return False
+        # whether this member may contain QObjects
+        mayContainQObjects, self._mayContainQObjects = self._mayContainQObjects, False
+        value = self._decode()
+        itemMayContainQObjects = self._mayContainQObjects
+        self._mayContainQObjects = mayContainQObjects or itemMayContainQObjects
+        if value is _INCOMPLETE:
+            return False
+        self._state = self._nextItem
+
+        if self._handleItem is not None:
+            self._handleItem(self._key, value, itemMayContainQObjects)
+        elif self._dataIsDict:
+            self._data[self._key] = value
+        else:
+            self._data.append(value)
+        return True
+
+    def _addObject(self, objectName, data, mayContainQObjects):
+        self._webChannel._addObject(objectName, data)
+
+    def _updateObject(self, key, entry, mayContainQObjects):
+        webChannel = self._webChannel
+        webChannel._mayContainQObjects = mayContainQObjects
+        try:
+            webChannel._updateObject(entry)
+        finally:
+            webChannel._mayContainQObjects = True
+
+    def _guessUpdate(self, key, value, mayContainQObjects):
+        # the first member tells whether the data is a list of property update entries
+        if type(value) is dict and value.keys() == _entryKeys and value["object"] in self._webChannel.objects:
+            self._handleItem = self._updateObject
+            self._updateObject(key, value, mayContainQObjects)
+        else:
+            self._handleItem = None
+            self._data = [value]
+
+    def _finish(self):
+        webChannel = self._webChannel
+        fields = self.fields
+        if webChannel.stats is not None:
+            webChannel.stats.messageReceived(fields, self.size)
+
+        if self._handleItem == self._addObject:
+            if fields.get("type") != QWebChannelMessageTypes.response or fields.get("id") != webChannel._initId:
+                print("invalid init response received: ", fields)
+                return
+            if webChannel.stats is not None:
+                webChannel.stats.callFinished(webChannel._initId)
+            if webChannel._popCall(webChannel._initId) is None:
+                return  # the init call has timed out
+            webChannel._mayContainQObjects = self._mayContainQObjects
+            try:
+                webChannel._unwrapAllProperties()
+                webChannel._finishInit()
+            finally:
+                webChannel._mayContainQObjects = True
+        elif self._handleItem is not None:
+            if fields.get("type") != QWebChannelMessageTypes.propertyUpdate:
+                print("invalid property update received: ", fields)
+                return
+            webChannel._propertyUpdateDone()
+        else:
+            if self._data is not None:
+                fields["data"] = self._data
+            webChannel._handleMessage(fields)
+
+        if webChannel._timers:
+            webChannel.runTimers()
+
+
+class StreamingFramer(LineFramer):
+    '''LineFramer which decodes messages exceeding threshold bytes while they are received.
+
+    Messages decoded that way are handled by webChannel directly, not passed to
+    the frame callback. Messages are never streamed while webChannel is being
+    recorded, as the recorder needs the complete message.'''
+
+    threshold = 1 << 16
+
+    def __init__(self, webChannel, maxFrameSize=None):
+        super().__init__(maxFrameSize)
+        self._webChannel = webChannel
+        self._message = None
+
+    def reset(self):
+        super().reset()
+        self._message = None
+
+    def feed(self, data, frameCallback):
+        message = self._message
+        if message is not None:
+            data = message.feed(data)
+            if data is None:
+                self._checkSize(message.size)
+                return
+            self._message = None
+
+        super().feed(data, frameCallback)
+
+        if len(self) > self.threshold and self._webChannel.recorder is None:
+            data = bytes(self.detach())
+            self._message = _StreamedMessage(self._webChannel)
+            self._message.feed(data)
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+'''A thread-safe QWebChannel client for synchronous, multi-threaded applications.
+
+The transport runs in an asyncio event loop on a dedicated I/O thread. Remote
+methods may be called from any thread and return concurrent.futures.Future
+objects; calls from all threads are multiplexed over the one connection:
+
+    with ThreadedQWebChannel.connectTcp("localhost", 12345) as channel:
+        chatserver = channel.objects["chatserver"]
+        print(chatserver.login("user").result(timeout=5))
+
+Signal callbacks run on the I/O thread, unless connected with an executor.
+Signals may be connected and disconnected, and properties written, from any
+thread; this takes effect on the I/O thread, too. Batches are per thread: the calls a thread makes within
+channel.batch() are handed to the I/O thread together when leaving it.'''
+
+from .asynchronous import QWebChannelProtocol
+from .qwebchannel import Batch as PlainBatch, QObject as PlainQObject
+import asyncio
+import concurrent.futures
+import threading
+
+
+def _setResult(fut, result):
+    if not fut.done():
+        fut.set_result(result)
+
+
+def _setException(fut, error):
+    if not fut.done():
+        fut.set_exception(error)
+
+
+class Batch(PlainBatch):
+    '''Batch of the thread which entered it, see ThreadedQWebChannel.batch().'''
+
+    def __init__(self, webChannel):
+        super().__init__(webChannel)
+        # (func, args) to run on the I/O thread, submitted by runInLoop()
+        self.submitted = []
+
+    def __exit__(self, *exc_info):
+        submitted, self.submitted = self.submitted, []
+        super().__exit__(*exc_info)
+        if self._outer is not None:
+            self._outer.submitted.extend(submitted)
+        elif submitted:
+            self._webChannel._submit(submitted)
+
+
+class QObject(PlainQObject):
+
+    __slots__ = ()
+
+    def _invokeMethod(self, methodIdx, arguments, timeout=None):
+        webChannel = self._webChannel
+        fut = concurrent.futures.Future()
+
+        def invoke():
+            if fut.cancelled():
+                return
+            try:
+                execId = PlainQObject._invokeMethod(
+                    self, methodIdx, arguments + (lambda result: _setResult(fut, result),),
+                    errback=lambda error: _setException(fut, error), timeout=timeout)
+            except Exception as e:
+                _setException(fut, e)
+                return
+
+            def handleDone(fut):
+                if fut.cancelled():
+                    webChannel.runInLoop(webChannel.cancelExec, execId)
+
+            fut.add_done_callback(handleDone)
+
+        webChannel.runInLoop(invoke)
+        return fut
+
+    # The property cache is only written on the I/O thread, which also records changes
+    def _setProperty(self, propertyIndex, propertyName, value):
+        self._webChannel.runInLoop(PlainQObject._setProperty, self, propertyIndex, propertyName, value)
+
+    # The callbacks of signals are only changed on the I/O thread, which invokes them
+    def _connectSignal(self, signal, callback):
+        self._webChannel.runInLoop(PlainQObject._connectSignal, self, signal, callback)
+
+    def _disconnectSignal(self, signal, callback):
+        self._webChannel.runInLoop(PlainQObject._disconnectSignal, self, signal, callback)
+
+
+class ThreadedQWebChannel(QWebChannelProtocol):
+    '''QWebChannelProtocol running on a background I/O thread, safe to use from any thread.
+
+    Create it with connectTcp() or connectUnix(), which block until the channel
+    is initialized.'''
+
+    QObjectType = QObject
+
+    def __init__(self, *args, **kwargs):
+        # holds the active batch of each thread
+        self._threadState = threading.local()
+        super().__init__(*args, **kwargs)
+        self._thread = None
+
+        # Functions to run on the I/O thread, submitted from other threads
+        self._submitted = []
+        self._submitLock = threading.Lock()
+        self._wakeupPending = False
+
+    @classmethod
+    def _start(cls, connect, timeout, kwargs):
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name="QWebChannel I/O", daemon=True)
+        thread.start()
+
+        async def setup():
+            channel = cls(loop=loop, **kwargs)
+            channel._thread = thread
+            await connect(loop, lambda: channel)
+            await channel
+            return channel
+
+        try:
+            return asyncio.run_coroutine_threadsafe(setup(), loop).result(timeout)
+        except BaseException:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            raise
+
+    @classmethod
+    def connectTcp(cls, host, port, timeout=None, **kwargs):
+        """Connects to a QWebChannel server over TCP and waits for initialization."""
+        return cls._start(lambda loop, factory: loop.create_connection(factory, host, port),
+                          timeout, kwargs)
+
+    @classmethod
+    def connectUnix(cls, path, timeout=None, **kwargs):
+        """Connects to a QWebChannel server over a Unix domain socket and waits for initialization."""
+        return cls._start(lambda loop, factory: loop.create_unix_connection(factory, path),
+                          timeout, kwargs)
+
+    def inIoThread(self):
+        return threading.get_ident() == self._thread.ident
+
+    @property
+    def _batch(self):
+        return getattr(self._threadState, 'batch', None)
+
+    @_batch.setter
+    def _batch(self, batch):
+        self._threadState.batch = batch
+
+    def batch(self):
+        """Returns a Batch for the calling thread.
+
+        Calls made within it by another thread than the I/O thread are run on
+        the I/O thread together when leaving the outermost batch, so their
+        messages are written at once. Their results are not available before."""
+        return Batch(self)
+
+    def runInLoop(self, func, *args):
+        """Runs func(*args) on the I/O thread; right away if called from it.
+
+        Functions submitted by other threads are collected and run together in
+        one batch, so their messages are written at once. Within a batch of the
+        calling thread, they are submitted when leaving it."""
+        if self._thread is None or self.inIoThread():
+            func(*args)
+            return
+
+        batch = self._batch
+        if batch is not None:
+            batch.submitted.append((func, args))
+        else:
+            self._submit([(func, args)])
+
+    def _submit(self, functions):
+        """Runs a list of (func, args) on the I/O thread."""
+        with self._submitLock:
+            self._submitted.extend(functions)
+            if self._wakeupPending:
+                return
+            self._wakeupPending = True
+        self._loop.call_soon_threadsafe(self._runSubmitted)
+
+    def _runSubmitted(self):
+        with self._submitLock:
+            submitted, self._submitted = self._submitted, []
+            self._wakeupPending = False
+
+        with self.batch():
+            for func, args in submitted:
+                func(*args)
+
+    def exec_(self, data, callback=None, errback=None, timeout=None):
+        # Property setters and signal connections end up here, possibly on another thread
+        if self._thread is not None and not self.inIoThread():
+            self.runInLoop(super().exec_, data, callback, errback, timeout)
+            return
+        return super().exec_(data, callback, errback, timeout)
+
+    def send(self, data):
+        # e.g. debug() from another thread
+        if self._thread is not None and not self.inIoThread():
+            self.runInLoop(super().send, data)
+            return
+        super().send(data)
+
+    def sendBatch(self, messages):
+        if self._thread is not None and not self.inIoThread():
+            self.runInLoop(super().sendBatch, messages)
+            return
+        super().sendBatch(messages)
+
+    # Change tracking and snapshots read the state the I/O thread modifies
+    def propertyVersion(self, objectName, propertyName):
+        return self.call(super().propertyVersion, objectName, propertyName)
+
+    def changesSince(self, version):
+        return self.call(super().changesSince, version)
+
+    def snapshot(self, objectNames=None):
+        return self.call(super().snapshot, objectNames)
+
+    def call(self, func, *args, timeout=None):
+        """Runs func(*args) on the I/O thread and returns its result."""
+        fut = concurrent.futures.Future()
+
+        def run():
+            try:
+                fut.set_result(func(*args))
+            except Exception as e:
+                fut.set_exception(e)
+
+        # not deferred by a batch of the calling thread, as it waits for the result
+        if self._thread is None or self.inIoThread():
+            run()
+        else:
+            self._submit([(run, ())])
+        return fut.result(timeout)
+
+    def close(self):
+        """Closes the connection and stops the I/O thread."""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+
+        def stop():
+            QWebChannelProtocol.close(self)
+            # let the transport deliver connection_lost first
+            self._loop.call_soon(self._loop.stop)
+
+        self._loop.call_soon_threadsafe(stop)
+        thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
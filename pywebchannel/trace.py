@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+'''Recording and replay of QWebChannel traffic.
+
+A TraceRecorder writes all messages sent and received by a channel to a trace
+file, with the time they were seen:
+
+    with TraceRecorder(channel, "session.trace.gz"):
+        ...
+
+replay() feeds the received messages of a trace into a channel, at the original
+pace, faster or slower, or as fast as possible. Together with a profiler, this
+reproduces the load of a real session without the Qt application:
+
+    python -m cProfile -s cumtime -m pywebchannel.trace replay session.trace.gz --speed 0
+
+A trace starts with a header (the magic bytes QWCTRACE, a format version and
+the start time in seconds since the epoch, as big-endian double). Each record
+has a header of the time since the start (double), the direction (one byte,
+see RECEIVED and SENT) and the size of the payload (unsigned 32 bit integer),
+followed by the encoded message. Traces are written and read sequentially, so
+they never have to fit in memory. Paths ending in .gz are compressed.'''
+
+from .qwebchannel import QWebChannel
+import argparse
+import asyncio
+import collections
+import gzip
+import struct
+import time
+
+
+MAGIC = b'QWCTRACE'
+VERSION = 1
+
+RECEIVED = 0
+SENT = 1
+
+_fileHeader = struct.Struct('>8sBd')
+_recordHeader = struct.Struct('>dBI')
+
+TraceRecord = collections.namedtuple('TraceRecord', ('timestamp', 'direction', 'payload'))
+
+
+class TraceFormatError(ValueError):
+    """Raised when reading a file which is not a valid trace."""
+
+
+def _open(fileOrPath, mode):
+    if not isinstance(fileOrPath, str):
+        return fileOrPath, False
+    if fileOrPath.endswith('.gz'):
+        return gzip.open(fileOrPath, mode), True
+    return open(fileOrPath, mode), True
+
+
+class TraceRecorder(object):
+    '''Records the messages of webChannel to a file, given as path or binary file object.
+
+    Recording starts right away and ends with close().'''
+
+    def __init__(self, webChannel, fileOrPath):
+        self._webChannel = webChannel
+        self._file, self._ownsFile = _open(fileOrPath, 'wb')
+        self._start = time.monotonic()
+        self._file.write(_fileHeader.pack(MAGIC, VERSION, time.time()))
+        self.records = 0
+        webChannel.recorder = self
+
+    def _write(self, direction, payload):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        elif isinstance(payload, dict):
+            payload = self._webChannel.codec.encode(payload)
+        self._file.write(_recordHeader.pack(time.monotonic() - self._start, direction, len(payload)))
+        self._file.write(payload)
+        self.records += 1
+
+    def received(self, data):
+        self._write(RECEIVED, data)
+
+    def sent(self, data):
+        self._write(SENT, data)
+
+    def close(self):
+        """Stops recording and closes the file if it was opened by the recorder."""
+        if self._webChannel.recorder is self:
+            self._webChannel.recorder = None
+        if self._ownsFile:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _readExactly(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise TraceFormatError("Trace ends within a record")
+    return data
+
+
+def readTrace(fileOrPath):
+    """Yields the TraceRecords of a trace one at a time."""
+    f, ownsFile = _open(fileOrPath, 'rb')
+    try:
+        header = f.read(_fileHeader.size)
+        if len(header) != _fileHeader.size:
+            raise TraceFormatError("Not a QWebChannel trace")
+        magic, version, startTime = _fileHeader.unpack(header)
+        if magic != MAGIC:
+            raise TraceFormatError("Not a QWebChannel trace")
+        if version != VERSION:
+            raise TraceFormatError("Unsupported trace version {}".format(version))
+
+        while True:
+            header = f.read(_recordHeader.size)
+            if not header:
+                return
+            if len(header) != _recordHeader.size:
+                raise TraceFormatError("Trace ends within a record")
+            timestamp, direction, size = _recordHeader.unpack(header)
+            yield TraceRecord(timestamp, direction, _readExactly(f, size))
+    finally:
+        if ownsFile:
+            f.close()
+
+
+class _NullTransport(object):
+
+    def send(self, data):
+        pass
+
+
+def _prepare(webChannel):
+    if webChannel is None:
+        webChannel = QWebChannel()
+    if getattr(webChannel, 'transport', None) is None:
+        # the messages sent by the channel are not needed, as the responses come from the trace
+        webChannel.connection_made(_NullTransport())
+    return webChannel
+
+
+def replay(fileOrPath, webChannel=None, speed=1.0):
+    """Feeds the received messages of a trace into webChannel and returns it.
+
+    Without a webChannel, a new QWebChannel is used. The messages are delivered
+    at the pace they were recorded, divided by speed; with speed 0, as fast as
+    possible. If the channel is not connected yet, it is connected to a transport
+    discarding all messages. Responses to calls the channel did not make are
+    ignored, so it may be set up differently than the recorded one. It has to
+    use the same codec, though."""
+    webChannel = _prepare(webChannel)
+    start = time.monotonic()
+    for record in readTrace(fileOrPath):
+        if record.direction != RECEIVED:
+            continue
+        if speed:
+            delay = start + record.timestamp / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        webChannel.message_received(record.payload)
+    return webChannel
+
+
+async def replayAsync(fileOrPath, webChannel=None, speed=1.0):
+    """Like replay(), but waits with asyncio.sleep(), so other tasks keep running.
+
+    With speed 0, it still yields to the event loop between messages."""
+    webChannel = _prepare(webChannel)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for record in readTrace(fileOrPath):
+        if record.direction != RECEIVED:
+            continue
+        delay = start + record.timestamp / speed - loop.time() if speed else 0
+        await asyncio.sleep(max(delay, 0))
+        webChannel.message_received(record.payload)
+    return webChannel
+
+
+def summarize(fileOrPath):
+    """Returns the number of messages, bytes and duration of a trace, by direction."""
+    summary = dict((name, {"messages": 0, "bytes": 0}) for name in ("received", "sent"))
+    duration = 0.0
+    for record in readTrace(fileOrPath):
+        entry = summary["received" if record.direction == RECEIVED else "sent"]
+        entry["messages"] += 1
+        entry["bytes"] += len(record.payload)
+        duration = record.timestamp
+    summary["duration"] = duration
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspects and replays QWebChannel traces.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="print a summary of a trace")
+    info.add_argument("trace")
+    replayCommand = commands.add_parser("replay", help="replay the received messages of a trace")
+    replayCommand.add_argument("trace")
+    replayCommand.add_argument("--speed", type=float, default=1.0,
+                               help="pace relative to the recording, 0 for maximum speed (default: 1)")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        summary = summarize(args.trace)
+        print("duration {:.3f} s".format(summary["duration"]))
+        for name in ("received", "sent"):
+            print("{:<9} {:>10} messages {:>14} bytes".format(
+                name, summary[name]["messages"], summary[name]["bytes"]))
+    else:
+        start = time.perf_counter()
+        replay(args.trace, speed=args.speed)
+        print("replayed in {:.3f} s".format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
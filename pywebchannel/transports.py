@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+'''Transports connecting a QWebChannel to its peer.
+
+A QWebChannel sends its messages through the transport passed to
+connection_made(), and the transport hands each received message to
+message_received(). Any object implementing the Transport interface will do;
+this module provides:
+
+- LoopbackTransport: in-memory connections, e.g. for tests and benchmarks
+  (see loopbackPair() and QWebChannelServer.connectChannel())
+- UnixSocketTransport: length-prefixed messages over a Unix domain socket,
+  to a QWebChannelServer serving with serveUnix(path, lengthPrefixed=True)
+- WebSocketTransport: an adapter for websockets, e.g. to a Qt application
+  using QWebSocketServer, as in the QtWebChannel examples'''
+
+from .framing import LengthPrefixFramer, FrameTooLargeError
+import asyncio
+import collections
+
+
+class Transport(object):
+    '''Interface of the transports of a QWebChannel.
+
+    The channel calls send() with each encoded message: bytes if the transport
+    is binary or the codec is, else str. The transport passes received
+    messages, as str or any bytes-like object, to the channel's
+    message_received() and calls its connection_closed() when the connection
+    is gone.'''
+
+    # Whether send() takes bytes for text codecs too
+    binary = False
+
+    def send(self, data):
+        """Sends one encoded message."""
+        raise NotImplementedError
+
+    def close(self):
+        """Closes the connection."""
+        raise NotImplementedError
+
+
+class LoopbackTransport(Transport):
+    '''One end of an in-memory connection, see loopbackPair().
+
+    Messages sent on one end are passed unchanged, without copying or framing,
+    to the receive callback of the other end. With a loop, they are delivered
+    in its next iteration, else right away. close() closes both ends, invoking
+    their close callbacks.'''
+
+    binary = True
+
+    def __init__(self, loop=None):
+        self._loop = loop
+        self.peer = None
+        # callback(data) invoked with each received message
+        self.onReceive = None
+        # callback() invoked once the connection is closed
+        self.onClose = None
+        self.closed = False
+
+    def connectChannel(self, webChannel):
+        """Makes webChannel the receiver of this end and connects it."""
+        self.onReceive = webChannel.message_received
+        self.onClose = webChannel.connection_closed
+        webChannel.connection_made(self)
+
+    def _receive(self, data):
+        if not self.closed:
+            self.onReceive(data)
+
+    def send(self, data):
+        if self.closed:
+            return
+        if self._loop is None:
+            self.peer._receive(data)
+        else:
+            self._loop.call_soon(self.peer._receive, data)
+
+    def close(self):
+        for end in (self, self.peer):
+            if not end.closed:
+                end.closed = True
+                if end.onClose is not None:
+                    end.onClose()
+
+
+def loopbackPair(loop=None):
+    """Returns two connected LoopbackTransports."""
+    a = LoopbackTransport(loop)
+    b = LoopbackTransport(loop)
+    a.peer = b
+    b.peer = a
+    return a, b
+
+
+class UnixSocketTransport(Transport, asyncio.Protocol):
+    '''Transport sending length-prefixed messages over a Unix domain socket.
+
+    Use connectUnix() to connect. Length prefixes save scanning for newlines,
+    and received messages are decoded straight from memoryviews into the
+    receive buffer. Messages are always sent as bytes and those sent within one
+    iteration of the event loop are written at once. Works over any other
+    streaming asyncio transport, too.'''
+
+    binary = True
+
+    def __init__(self, webChannel, maxFrameSize=None):
+        self._webChannel = webChannel
+        self._framer = LengthPrefixFramer(maxFrameSize)
+        self.transport = None
+        self._outgoing = []
+        self._flushScheduled = False
+        self._loop = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._loop = asyncio.get_event_loop()
+        self._framer.reset()
+        self._webChannel.connection_made(self)
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self._outgoing = []
+        self._webChannel.connection_closed()
+
+    def data_received(self, data):
+        try:
+            self._framer.feed(data, self._webChannel.message_received)
+        except FrameTooLargeError as e:
+            print("Closing connection: " + str(e))
+            self.transport.close()
+
+    def send(self, data):
+        if self.transport is None:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._outgoing.extend(self._framer.pack(data))
+        if not self._flushScheduled:
+            self._flushScheduled = True
+            self._loop.call_soon(self.flush)
+
+    def flush(self):
+        """Writes the buffered messages now."""
+        self._flushScheduled = False
+        if self._outgoing and self.transport is not None:
+            outgoing, self._outgoing = self._outgoing, []
+            self.transport.writelines(outgoing)
+
+    def close(self):
+        if self.transport is not None:
+            self.flush()
+            self.transport.close()
+
+
+async def connectUnix(webChannel, path, **kwargs):
+    """Connects webChannel to the Unix domain socket at path. Returns the UnixSocketTransport.
+
+    kwargs are passed to UnixSocketTransport."""
+    loop = asyncio.get_event_loop()
+    _, transport = await loop.create_unix_connection(
+        lambda: UnixSocketTransport(webChannel, **kwargs), path)
+    return transport
+
+
+class WebSocketTransport(Transport):
+    '''Adapter for a websocket of the websockets package.
+
+    Also works with any object offering async send(data), async iteration over
+    the received messages and async close(). Messages are sent in order by a
+    single writer task, so sending does not create a task per message:
+
+        async with websockets.connect(url) as websocket:
+            transport = WebSocketTransport(webChannel, websocket)
+            asyncio.ensure_future(transport.run())
+            await webChannel'''
+
+    def __init__(self, webChannel, websocket):
+        self._webChannel = webChannel
+        self.websocket = websocket
+        self._outgoing = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._writer = None
+        self.closed = False
+
+    async def run(self):
+        """Connects the channel and passes it the received messages until the websocket closes."""
+        self._writer = asyncio.ensure_future(self._write())
+        self._webChannel.connection_made(self)
+        try:
+            async for message in self.websocket:
+                self._webChannel.message_received(message)
+        finally:
+            self.closed = True
+            self._writer.cancel()
+            self._webChannel.connection_closed()
+
+    async def _write(self):
+        outgoing = self._outgoing
+        while True:
+            while outgoing:
+                await self.websocket.send(outgoing.popleft())
+            if self.closed:
+                await self.websocket.close()
+                return
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def send(self, data):
+        if not self.closed:
+            self._outgoing.append(data)
+            self._wakeup.set()
+
+    def close(self):
+        """Closes the websocket once all messages sent before have been written."""
+        self.closed = True
+        self._wakeup.set()
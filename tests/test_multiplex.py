@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+'''Tests of ChannelHub, serving in-memory clients through an upstream channel to a QWebChannelServer.'''
+
+from pywebchannel import server
+from pywebchannel.asynchronous import QWebChannel
+from pywebchannel.multiplex import ChannelHub
+from pywebchannel.qwebchannel import QWebChannelMessageTypes
+import asyncio
+import unittest
+
+
+class Item(object):
+    label = server.Property("")
+
+    def __init__(self, label):
+        self.label = label
+
+
+class Sensor(object):
+    alarm = server.Signal()
+    reading = server.Property(0)
+    item = server.Property(None)
+
+
+class _RecordingServer(server.QWebChannelServer):
+    '''QWebChannelServer keeping all messages it receives.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = []
+
+    def messageReceived(self, session, message):
+        self.received.append(message)
+        super().messageReceived(session, message)
+
+
+class ChannelHubTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.sensor = Sensor()
+        self.sensor.item = Item("first")
+        self.server = _RecordingServer(loop=self.loop)
+        self.server.registerObject("sensor", self.sensor)
+        self.upstream = QWebChannel(loop=self.loop)
+        self.server.connectChannel(self.upstream)
+        self.hub = ChannelHub(self.upstream)
+        self.views = []
+        self.transports = []
+        for _ in range(2):
+            view = QWebChannel(loop=self.loop)
+            self.transports.append(self.hub.connectChannel(view))
+            self.views.append(view)
+
+        async def initialized():
+            await asyncio.gather(self.upstream, *self.views)
+
+        self.loop.run_until_complete(asyncio.wait_for(initialized(), 5))
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _settle(self):
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+
+    def _received(self, messageType):
+        return [message for message in self.server.received if message["type"] == messageType]
+
+    def testInitIsAnsweredByTheHub(self):
+        self.assertEqual(len(self._received(QWebChannelMessageTypes.init)), 1)
+        for view in self.views:
+            sensor = view.objects["sensor"]
+            self.assertEqual(sensor.reading, 0)
+            self.assertEqual(sensor.item.label, "first")
+
+    def testSignalConnectionsAreShared(self):
+        alarms = []
+        callbacks = [lambda *args, i=i: alarms.append((i, args)) for i in range(2)]
+        for view, callback in zip(self.views, callbacks):
+            view.objects["sensor"].alarm.connect(callback)
+        self._settle()
+        self.assertEqual(len(self._received(QWebChannelMessageTypes.connectToSignal)), 1)
+
+        self.sensor.alarm.emit("fire")
+        self._settle()
+        self.assertEqual(sorted(alarms), [(0, ("fire",)), (1, ("fire",))])
+
+        self.views[0].objects["sensor"].alarm.disconnect(callbacks[0])
+        self._settle()
+        self.assertEqual(self._received(QWebChannelMessageTypes.disconnectFromSignal), [])
+        self.sensor.alarm.emit("again")
+        self._settle()
+        self.assertEqual(alarms[2:], [(1, ("again",))])
+
+        self.views[1].objects["sensor"].alarm.disconnect(callbacks[1])
+        self._settle()
+        self.assertEqual(len(self._received(QWebChannelMessageTypes.disconnectFromSignal)), 1)
+
+    def testClosedClientReleasesSignals(self):
+        for view in self.views:
+            view.objects["sensor"].alarm.connect(lambda *args: None)
+        self._settle()
+        self.transports[0].close()
+        self._settle()
+        self.assertEqual(self._received(QWebChannelMessageTypes.disconnectFromSignal), [])
+        self.transports[1].close()
+        self._settle()
+        self.assertEqual(len(self._received(QWebChannelMessageTypes.disconnectFromSignal)), 1)
+
+    def testPropertyUpdatesReachAllClients(self):
+        readings = []
+        for view in self.views:
+            view.objects["sensor"].readingChanged.connect(readings.append)
+        self.sensor.reading = 5
+        self.sensor.item = Item("second")
+        self._settle()
+        self.assertEqual(readings, [5, 5])
+        for view in self.views:
+            sensor = view.objects["sensor"]
+            self.assertEqual(sensor.reading, 5)
+            # the object is new to the clients, so the hub describes it
+            self.assertEqual(sensor.item.label, "second")
+            self.assertIs(view.objects[sensor.item._id], sensor.item)
+
+        # updates are merged for clients which have not processed the previous one
+        for reading in range(6, 10):
+            self.sensor.reading = reading
+        self._settle()
+        for view in self.views:
+            self.assertEqual(view.objects["sensor"].reading, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
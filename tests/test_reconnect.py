@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+'''Tests of ReconnectingQWebChannel, against a QWebChannelServer dropping connections.'''
+
+from pywebchannel import server
+from pywebchannel.asynchronous import ReconnectingQWebChannel
+from pywebchannel.qwebchannel import QWebChannelMessageTypes
+import asyncio
+import unittest
+
+
+class Calculator(object):
+    total = server.Property(0)
+
+    def add(self, a, b):
+        return a + b
+
+
+class _DroppingServerProtocol(server.QWebChannelServerProtocol):
+    '''Aborts the connection instead of handling a message whose type is in drops.
+
+    Each entry of drops is used up by one dropped connection.'''
+
+    def __init__(self, qWebChannelServer, drops):
+        super().__init__(qWebChannelServer)
+        self._drops = drops
+        self._dropped = False
+
+    def _frame_received(self, frame):
+        if self._dropped:
+            return
+        message = self.codec.decode(frame)
+        if message.get("type") in self._drops:
+            self._drops.remove(message["type"])
+            self._dropped = True
+            self.transport.abort()
+            return
+        self.server.messageReceived(self.session, message)
+
+
+class ReconnectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.calculator = Calculator()
+        self.server = server.QWebChannelServer(loop=self.loop)
+        self.server.registerObject("calculator", self.calculator)
+        self.drops = []
+        self.tcpServer = self.loop.run_until_complete(self.loop.create_server(
+            lambda: _DroppingServerProtocol(self.server, self.drops), "127.0.0.1", 0))
+        port = self.tcpServer.sockets[0].getsockname()[1]
+
+        self.initCount = 0
+
+        def initialized(channel):
+            self.initCount += 1
+
+        self.channel = ReconnectingQWebChannel(
+            lambda factory: self.loop.create_connection(factory, "127.0.0.1", port),
+            initCallback=initialized, retryInterval=0.01, loop=self.loop)
+
+    def tearDown(self):
+        self.channel.close()
+        self.tcpServer.close()
+        self.loop.run_until_complete(self.tcpServer.wait_closed())
+        self.loop.close()
+
+    def _wait(self, awaitable, timeout=5):
+        return self.loop.run_until_complete(asyncio.wait_for(awaitable, timeout))
+
+    def _settle(self):
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+
+    def testDroppedInitIsNotReplayed(self):
+        self.drops.append(QWebChannelMessageTypes.init)
+        self._wait(self.channel.start())
+        self._settle()
+        self.assertEqual(self.initCount, 1)
+        self.assertFalse(self.drops)
+        calculator = self.channel.objects["calculator"]
+        self.assertEqual(self._wait(calculator.add(1, 2)), 3)
+        self.assertIs(self.channel.objects["calculator"], calculator)
+
+    def testPendingCallsAreReplayed(self):
+        self._wait(self.channel.start())
+        calculator = self.channel.objects["calculator"]
+        self.drops.append(QWebChannelMessageTypes.invokeMethod)
+        self.assertEqual(self._wait(calculator.add(2, 3)), 5)
+        self.assertFalse(self.drops)
+        self.assertEqual(self.initCount, 2)
+        # the objects of the first connection stay valid and are updated
+        self.assertIs(self.channel.objects["calculator"], calculator)
+        changes = []
+        calculator.totalChanged.connect(changes.append)
+        self.calculator.total = 7
+        self._settle()
+        self.assertEqual(calculator.total, 7)
+        self.assertEqual(changes, [7])
+
+
+if __name__ == '__main__':
+    unittest.main()
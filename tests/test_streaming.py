@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+'''Tests of the incremental decoding of large messages, see pywebchannel.streaming.
+
+A session with an in-process QWebChannelServer is recorded once, then the
+messages the server sent are replayed to clients in pieces of various sizes.
+Clients decoding large messages while they are received must end up in the
+same state as clients decoding complete messages.'''
+
+from pywebchannel import server
+from pywebchannel.asynchronous import QWebChannelProtocol
+from pywebchannel.multiplex import ChannelHub
+from pywebchannel.qwebchannel import QObject, QWebChannel, QWebChannelMessageTypes
+import asyncio
+import json
+import unittest
+
+
+class Item(object):
+    label = server.Property("")
+
+    def __init__(self, label):
+        self.label = label
+
+
+class Store(object):
+    restocked = server.Signal()
+    items = server.Property([])
+    prices = server.Property({})
+    featured = server.Property(None)
+
+    def __init__(self, index):
+        self.items = [{"name": "Grüße ✓ 𝄞 {}".format(i), "count": i, "weight": i / 8}
+                      for i in range(40)]
+        self.prices = dict(("article{}".format(i), i * 1.25) for i in range(40))
+        self.featured = Item("featured {}".format(index))
+
+
+class _ServerTransport(object):
+    '''Transport of the server end, collecting the data written to the client.'''
+
+    def __init__(self):
+        self.written = bytearray()
+
+    def writelines(self, buffers):
+        for data in buffers:
+            self.written += data
+
+    def close(self):
+        pass
+
+
+class _ClientTransport(object):
+    '''Transport of the client end, passing the data written to the server, if any.'''
+
+    def __init__(self, serverProtocol=None):
+        self.serverProtocol = serverProtocol
+
+    def writelines(self, buffers):
+        if self.serverProtocol is not None:
+            self.serverProtocol.data_received(b''.join(buffers))
+
+    def close(self):
+        pass
+
+
+def _plain(value):
+    """Replaces QObjects in value by their ids, for comparing the state of clients."""
+    if isinstance(value, QObject):
+        return ("QObject", value._id)
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, _plain(v)) for k, v in value.items())
+    return value
+
+
+def _state(client):
+    """Returns the property values of all objects of client, by object and property name."""
+    return dict((name, dict((propertyName, _plain(getattr(client.objects[name], propertyName)))
+                            for propertyName in client.objects[name]._propertyNames.values()))
+                for name in sorted(client.objects))
+
+
+class StreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _client(self, transport, streaming, lazy=False):
+        client = QWebChannelProtocol(loop=self.loop, streaming=streaming, lazy=lazy)
+        if streaming:
+            # decode all but the smallest messages while they are received
+            client._framer.threshold = 64
+        client.signalArgs = []
+        client.connection_made(transport)
+        client.flush()
+        return client
+
+    def _connect(self, client):
+        for name in sorted(client.objects):
+            if name.startswith("store"):
+                client.objects[name].restocked.connect(
+                    lambda *args: client.signalArgs.append(_plain(args)))
+        client.flush()
+
+    def _record(self):
+        """Runs a session with a server. Returns the data the server sent after each step."""
+        stores = [Store(i) for i in range(5)]
+        qWebChannelServer = server.QWebChannelServer()
+        for i, store in enumerate(stores):
+            qWebChannelServer.registerObject("store{}".format(i), store)
+        serverTransport = _ServerTransport()
+        serverProtocol = server.QWebChannelServerProtocol(qWebChannelServer)
+        serverProtocol.connection_made(serverTransport)
+
+        steps = []
+        client = self._client(_ClientTransport(serverProtocol), streaming=False)
+
+        def deliver():
+            data = bytes(serverTransport.written)
+            serverTransport.written.clear()
+            steps.append(data)
+            client.data_received(data)
+            client.flush()
+
+        deliver()
+        self.assertTrue(client.isInitialized())
+        self._connect(client)
+
+        for store in stores:
+            store.items = store.items[::-1] + [{"name": "neu ✓", "count": -1, "weight": 0.5}]
+            store.prices = dict(store.prices, article0=1e-7)
+            store.featured = Item("new ✓")
+        for store in stores:
+            store.restocked.emit(store.items, [Item("in signal")])
+        deliver()
+        # updates made while the client was busy are sent once it is idle
+        deliver()
+        self.assertFalse(serverTransport.written)
+        return steps, _state(client), client.signalArgs
+
+    def _replay(self, steps, streaming, chunkSize, lazy=False):
+        client = self._client(_ClientTransport(), streaming, lazy)
+        for i, data in enumerate(steps):
+            for start in range(0, len(data), chunkSize):
+                client.data_received(data[start:start + chunkSize])
+            client.flush()
+            if i == 0:
+                self.assertTrue(client.isInitialized())
+                self._connect(client)
+        return _state(client), client.signalArgs
+
+    def testStreamingMatchesCompleteMessages(self):
+        steps, state, signalArgs = self._record()
+        self.assertGreater(max(map(len, steps)), 10000)
+        self.assertEqual(self._replay(steps, False, max(map(len, steps))), (state, signalArgs))
+        for lazy in (False, True):
+            expected = self._replay(steps, False, max(map(len, steps)), lazy)
+            for chunkSize in (max(map(len, steps)), 4096, 7, 1):
+                with self.subTest(lazy=lazy, chunkSize=chunkSize):
+                    self.assertEqual(self._replay(steps, True, chunkSize, lazy), expected)
+
+    def testResponseBeforeInit(self):
+        client = self._client(_ClientTransport(), streaming=True)
+        responses = []
+        callId = client.exec_({"type": QWebChannelMessageTypes.invokeMethod, "object": "store0",
+                               "method": 5, "args": []}, responses.append)
+        client.flush()
+
+        # a large dict answering another call must not be taken for the init response
+        data = dict(("key{}".format(i), {"methods": [], "properties": [], "signals": []}) for i in range(20))
+        message = json.dumps({"data": data, "id": callId, "type": QWebChannelMessageTypes.response},
+                             sort_keys=True)
+        for i in range(len(message)):
+            client.data_received(message[i:i + 1].encode('utf-8'))
+        client.data_received(b'\n')
+        self.assertEqual(responses, [data])
+        self.assertFalse(client.isInitialized())
+        self.assertEqual(len(client.objects), 0)
+
+        steps = self._record()[0][:1]
+        for i in range(0, len(steps[0]), 3):
+            client.data_received(steps[0][i:i + 3])
+        self.assertTrue(client.isInitialized())
+        self.assertEqual(_state(client), self._replay(steps, False, len(steps[0]))[0])
+
+    def testHubWithStreamingUpstream(self):
+        store = Store(0)
+        qWebChannelServer = server.QWebChannelServer()
+        qWebChannelServer.registerObject("store0", store)
+        serverTransport = _ServerTransport()
+        serverProtocol = server.QWebChannelServerProtocol(qWebChannelServer)
+        serverProtocol.connection_made(serverTransport)
+        upstream = self._client(_ClientTransport(serverProtocol), streaming=True)
+
+        def pump():
+            for _ in range(10):
+                self.loop.run_until_complete(asyncio.sleep(0))
+                upstream.flush()
+                data = bytes(serverTransport.written)
+                serverTransport.written.clear()
+                for start in range(0, len(data), 1000):
+                    upstream.data_received(data[start:start + 1000])
+
+        pump()
+        self.assertTrue(upstream.isInitialized())
+        hub = ChannelHub(upstream)
+        views = [QWebChannel() for _ in range(2)]
+        notified = []
+        for view in views:
+            hub.connectChannel(view)
+            pump()
+            self.assertTrue(view.isInitialized())
+            view.objects["store0"].itemsChanged.connect(lambda items: notified.append(len(items)))
+
+        # updates far above the threshold are applied by the upstream while received
+        store.items = list(range(20000))
+        store.featured = Item("streamed ✓")
+        pump()
+        self.assertEqual(len(upstream.objects["store0"].items), 20000)
+        self.assertEqual(notified, [20000, 20000])
+        for view in views:
+            self.assertEqual(view.objects["store0"].items, list(range(20000)))
+            self.assertEqual(view.objects["store0"].featured.label, "streamed ✓")
+
+        # the views sent idle, so the next update reaches them, too
+        store.items = [1]
+        pump()
+        self.assertEqual(notified, [20000, 20000, 1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+'''Tests of ThreadedQWebChannel, against a QWebChannelServer running on another thread.'''
+
+from pywebchannel import server
+from pywebchannel.threaded import ThreadedQWebChannel
+import asyncio
+import threading
+import time
+import unittest
+
+
+class Calculator(object):
+    computed = server.Signal()
+
+    def add(self, a, b):
+        return a + b
+
+
+# published object with many properties, changed all the time by the server
+Panel = type("Panel", (object,), dict(("value{}".format(i), server.Property(0)) for i in range(50)))
+
+
+class ThreadedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.serverLoop = asyncio.new_event_loop()
+        qWebChannelServer = server.QWebChannelServer(loop=self.serverLoop)
+        qWebChannelServer.registerObject("calculator", Calculator())
+        self.panel = Panel()
+        qWebChannelServer.registerObject("panel", self.panel)
+        self.churning = False
+        tcpServer = self.serverLoop.run_until_complete(qWebChannelServer.serve("127.0.0.1", 0))
+        port = tcpServer.sockets[0].getsockname()[1]
+        self.serverThread = threading.Thread(target=self.serverLoop.run_forever, daemon=True)
+        self.serverThread.start()
+        self.channel = ThreadedQWebChannel.connectTcp("127.0.0.1", port, timeout=5)
+
+    def tearDown(self):
+        self.churning = False
+        self.channel.close()
+        self.serverLoop.call_soon_threadsafe(self.serverLoop.stop)
+        self.serverThread.join()
+
+    def testBatchesArePerThread(self):
+        calculator = self.channel.objects["calculator"]
+        entered = threading.Event()
+        futures = []
+
+        def batchedCalls():
+            with self.channel.batch():
+                entered.set()
+                futures.extend(calculator.add(i, 1) for i in range(3))
+                with self.channel.batch():
+                    futures.append(calculator.add(10, 1))
+                time.sleep(0.2)
+                # submitted to the I/O thread only when leaving the batch
+                self.assertFalse(any(future.done() for future in futures))
+
+        thread = threading.Thread(target=batchedCalls)
+        thread.start()
+        entered.wait()
+        # calls of other threads are not held by the batch
+        self.assertEqual(calculator.add(1, 1).result(1), 2)
+        thread.join()
+        self.assertEqual([future.result(2) for future in futures], [1, 2, 3, 11])
+
+    def testConnectSignalsFromAnotherThread(self):
+        calculator = self.channel.objects["calculator"]
+        callback = lambda: None
+        self.channel.connectSignals([(calculator.computed, callback)])
+        self.assertEqual(self.channel.call(lambda: len(calculator._objectSignals)), 1)
+        self.channel.disconnectSignals([(calculator.computed, callback)])
+        self.assertEqual(self.channel.call(lambda: calculator._objectSignals), {})
+
+    async def _churn(self):
+        count = 0
+        while self.churning:
+            count += 1
+            for i in range(50):
+                setattr(self.panel, "value{}".format(i), count)
+            await asyncio.sleep(0)
+
+    def testChangeTrackingFromAnotherThread(self):
+        self.channel.enableChangeTracking()
+        panel = self.channel.objects["panel"]
+        self.churning = True
+        asyncio.run_coroutine_threadsafe(self._churn(), self.serverLoop)
+
+        def writeProperties():
+            for i in range(200):
+                panel.value0 = -i
+
+        writers = [threading.Thread(target=writeProperties) for _ in range(4)]
+        for writer in writers:
+            writer.start()
+        version = 0
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            changes = self.channel.changesSince(version)
+            versions = [change.version for change in changes]
+            self.assertEqual(versions, sorted(set(versions)))
+            if changes:
+                self.assertGreater(versions[0], version)
+                version = versions[-1]
+            snapshot = self.channel.snapshot(["panel"])["panel"]
+            self.assertEqual(len(snapshot), 50)
+        for writer in writers:
+            writer.join()
+        self.churning = False
+        self.assertGreater(version, 0)
+        self.assertIsNotNone(self.channel.propertyVersion("panel", "value0"))
+
+
+if __name__ == '__main__':
+    unittest.main()